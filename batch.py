@@ -0,0 +1,307 @@
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+try:
+    from .video_cutter_lib import download_video, download_full_video, cut_video, fetch_playlist_entries, normalize_video_id, time_to_seconds, seconds_to_time
+except ImportError:
+    from video_cutter_lib import download_video, download_full_video, cut_video, fetch_playlist_entries, normalize_video_id, time_to_seconds, seconds_to_time
+
+try:
+    from .output_naming import OutputNamer
+except ImportError:
+    from output_naming import OutputNamer
+
+try:
+    from . import tracing
+except ImportError:
+    import tracing
+
+logger = logging.getLogger(__name__)
+
+ROW_DONE = "done"
+ROW_FAILED = "failed"
+DEFAULT_BATCH_DIR = "~/.cache/ytc-video-cutter/batches"
+
+def _normalize_time(value):
+    """"HH:MM:SS", "MM:SS" or plain seconds -> "HH:MM:SS"; empty -> None (whole video)."""
+    value = (value or "").strip() if isinstance(value, str) else value
+    if value in (None, ""):
+        return None
+    return seconds_to_time(time_to_seconds(value))
+
+def _make_row(url, start=None, end=None, title=None):
+    url = (url or "").strip()
+    if not url.startswith(("http://", "https://")):
+        raise ValueError(f"Invalid URL '{url}'")
+    start, end = _normalize_time(start), _normalize_time(end)
+    if (start is None) != (end is None):
+        raise ValueError(f"Row for {url} needs both a start and an end time (or neither for the whole video)")
+    if start is not None and time_to_seconds(end) <= time_to_seconds(start):
+        raise ValueError(f"Row for {url} ends before it starts ({start}-{end})")
+    return {'url': url, 'start': start, 'end': end, 'title': title or None}
+
+def load_manifest(path):
+    """Reads the rows of a batch manifest.
+
+    A .jsonl manifest holds one {"url", "start", "end"} object per line; anything else is read as
+    CSV with url,start,end columns (the header row is optional). Rows without start and end
+    download the whole video. Times are HH:MM:SS, MM:SS or seconds. Raises ValueError on bad rows.
+    """
+    rows = []
+    with open(os.path.expanduser(path), "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                    rows.append(_make_row(entry.get('url'), entry.get('start'), entry.get('end'), entry.get('title')))
+                except (ValueError, AttributeError) as e:
+                    raise ValueError(f"{path}:{line_number}: {e}")
+        else:
+            for line_number, fields in enumerate(csv.reader(f), 1):
+                fields = [field.strip() for field in fields]
+                if not any(fields) or fields[0].startswith("#"):
+                    continue
+                if line_number == 1 and fields[0].lower() == "url":
+                    continue # Header
+                fields += [""] * (3 - len(fields))
+                try:
+                    rows.append(_make_row(*fields[:3]))
+                except ValueError as e:
+                    raise ValueError(f"{path}:{line_number}: {e}")
+    return rows
+
+def load_batch_source(source, process_callback=None):
+    """Returns the rows of a manifest path, or one whole-video row per entry of a playlist URL."""
+    if source.startswith(("http://", "https://")):
+        return [_make_row(entry['url'], title=entry.get('title')) for entry in fetch_playlist_entries(source, process_callback)]
+    return load_manifest(source)
+
+def default_journal_path(source, batch_dir=DEFAULT_BATCH_DIR):
+    """Journal location for a batch: next to a manifest, or in batch_dir for a playlist URL."""
+    if source.startswith(("http://", "https://")):
+        return os.path.join(os.path.expanduser(batch_dir), f"{normalize_video_id(source)}.jsonl")
+    return os.path.expanduser(source) + ".journal.jsonl"
+
+def row_key(row):
+    """Stable identity of a manifest row, used to find it in the journal."""
+    return hashlib.sha1(f"{normalize_video_id(row['url'])}|{row['start']}|{row['end']}".encode("utf-8")).hexdigest()[:16]
+
+class BatchJournal:
+    """Append-only JSONL log of finished batch rows.
+
+    Every finished row appends one {"key", "status", "output", "error", "time"} line, flushed and
+    fsynced before the row counts as done, so an interrupted batch can be rerun and skips exactly
+    the rows that completed. The last line for a key wins; failed rows are retried on the next run.
+    A torn last line (crash mid-write) is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        self._lock = threading.Lock()
+        self._status = {}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Skipping unreadable line in batch journal {self.path}")
+                        continue
+                    self._status[entry['key']] = entry
+        except FileNotFoundError:
+            pass
+
+    def is_done(self, key):
+        with self._lock:
+            entry = self._status.get(key)
+        return entry is not None and entry['status'] == ROW_DONE
+
+    def record(self, key, status, output=None, error=None):
+        entry = {'key': key, 'status': status, 'output': output, 'error': error, 'time': time.time()}
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._status[key] = entry
+
+def group_rows(rows):
+    """Groups rows by source video (in first-seen order) so each video is fetched once."""
+    groups = OrderedDict()
+    for row in rows:
+        groups.setdefault(normalize_video_id(row['url']), []).append(row)
+    return list(groups.values())
+
+class BatchRunner:
+    """Runs manifest rows through a bounded pool of workers, one source video per task.
+
+    Within a group, whole-video rows are downloaded straight to their output file and that file
+    doubles as the source for the group's cuts; otherwise the source is downloaded once into a
+    temporary directory and every cut of the group is taken from it. download_slot/ffmpeg_slot
+    are optional context manager factories limiting concurrency (e.g. the extension's job engine
+    slots); should_stop is polled between rows to stop early.
+    """
+
+    def __init__(self, output_directory, journal, workers=2, template=None, process_callback=None,
+                 download_slot=None, ffmpeg_slot=None, should_stop=None, on_row_finished=None):
+        self.namer = OutputNamer(output_directory, template)
+        self.journal = journal
+        self.workers = max(1, workers)
+        self.process_callback = process_callback
+        self.download_slot = download_slot or nullcontext
+        self.ffmpeg_slot = ffmpeg_slot or nullcontext
+        self.should_stop = should_stop or (lambda: False)
+        self.on_row_finished = on_row_finished
+        self._lock = threading.Lock()
+        self.summary = {}
+
+    def run(self, rows):
+        """Runs all pending rows and returns the summary (see format_summary)."""
+        self.summary = {'rows': len(rows), 'done': 0, 'skipped': 0, 'failed': 0, 'bytes_downloaded': 0,
+                        'bytes_written': 0, 'elapsed': 0.0, 'stopped': False, 'failures': []}
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ytc-batch") as pool:
+            for future in [pool.submit(self._run_group, group) for group in group_rows(rows)]:
+                future.result()
+        self.summary['elapsed'] = time.monotonic() - started
+        self.summary['stopped'] = self.should_stop()
+        return self.summary
+
+    def _run_group(self, group):
+        pending = []
+        for row in group:
+            if self.journal.is_done(row_key(row)):
+                self._count('skipped')
+            else:
+                pending.append(row)
+        full_rows = [row for row in pending if row['start'] is None]
+        cut_rows = [row for row in pending if row['start'] is not None]
+        source_path = None
+        for row in full_rows:
+            output_path = self._run_row(row, self._download_full_row)
+            source_path = source_path or output_path
+        if not cut_rows or self.should_stop():
+            return
+        with tempfile.TemporaryDirectory(prefix="ytc-batch-") as tmpdir:
+            if source_path is None:
+                try:
+                    source_path = self._download_source(cut_rows[0]['url'], tmpdir)
+                except Exception as e:
+                    if self.should_stop():
+                        return
+                    for row in cut_rows:
+                        self._fail(row, e)
+                    return
+            for row in cut_rows:
+                self._run_row(row, lambda row, output_path: self._cut_row(row, source_path, output_path))
+
+    def _run_row(self, row, action):
+        """Runs action(row, output_path) for one row and journals the outcome. Returns the output path or None."""
+        if self.should_stop():
+            return None
+        output_path = self.namer.allocate(title=row['title'], video_id=normalize_video_id(row['url']), start=row['start'], end=row['end'])
+        try:
+            output_path = action(row, output_path) or output_path
+        except Exception as e:
+            OutputNamer.release(output_path)
+            if not self.should_stop(): # Rows killed by a stop request are simply retried on resume
+                self._fail(row, e)
+            return None
+        self.journal.record(row_key(row), ROW_DONE, output=output_path)
+        with self._lock:
+            self.summary['bytes_written'] += os.path.getsize(output_path)
+        self._count('done')
+        return output_path
+
+    def _download_full_row(self, row, output_path):
+        with self.download_slot():
+            output_path = download_full_video(row['url'], output_path, process_callback=self.process_callback)
+        with self._lock:
+            self.summary['bytes_downloaded'] += os.path.getsize(output_path)
+        return output_path
+
+    def _download_source(self, url, work_dir):
+        source_path = os.path.join(work_dir, "source.mp4")
+        with self.download_slot():
+            download_video(url, source_path, process_callback=self.process_callback)
+        with self._lock:
+            self.summary['bytes_downloaded'] += os.path.getsize(source_path)
+        return source_path
+
+    def _cut_row(self, row, source_path, output_path):
+        with self.ffmpeg_slot():
+            cut_video(source_path, row['start'], row['end'], output_path, process_callback=self.process_callback)
+        return output_path
+
+    def _fail(self, row, error):
+        message = str(getattr(error, 'stderr', None) or error).strip().splitlines()
+        message = message[-1] if message else type(error).__name__
+        logger.error(f"Batch row failed: {row['url']} {row['start'] or ''}-{row['end'] or ''}: {message}")
+        self.journal.record(row_key(row), ROW_FAILED, error=message)
+        with self._lock:
+            self.summary['failures'].append({'url': row['url'], 'start': row['start'], 'end': row['end'], 'error': message})
+        self._count('failed')
+
+    def _count(self, field):
+        with self._lock:
+            self.summary[field] += 1
+            snapshot = dict(self.summary)
+        if self.on_row_finished:
+            self.on_row_finished(snapshot)
+
+def format_summary(summary):
+    """One-line summary of a finished batch: row counts and throughput."""
+    elapsed = max(summary['elapsed'], 0.001)
+    text = (f"{summary['done']} done, {summary['skipped']} already done, {summary['failed']} failed of {summary['rows']} rows "
+            f"in {elapsed:.1f}s ({summary['done'] * 60 / elapsed:.1f} rows/min, "
+            f"{summary['bytes_downloaded'] / (1024 * 1024) / elapsed:.2f} MB/s downloaded, "
+            f"{summary['bytes_written'] / (1024 * 1024):.1f} MB written)")
+    if summary['stopped']:
+        text += "; stopped early, rerun to resume"
+    return text
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cut or download many videos from a CSV/JSONL manifest (url,start,end) or a playlist URL.")
+    parser.add_argument("source", help="manifest file (.csv or .jsonl) or playlist URL")
+    parser.add_argument("-o", "--output-dir", default="~/Downloads", help="directory for the results (default: ~/Downloads)")
+    parser.add_argument("-j", "--workers", type=int, default=2, help="videos processed at the same time (default: 2)")
+    parser.add_argument("--journal", help="journal file recording finished rows (default: next to the manifest, or in " + DEFAULT_BATCH_DIR + ")")
+    parser.add_argument("--template", default=None, help="output filename template, e.g. '{title}_{start}-{end}.mp4' (default: '{n}.mp4')")
+    parser.add_argument("--trace", metavar="FILE", help="write per-phase timing spans to this JSONL file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    if args.trace:
+        tracing.configure(args.trace)
+
+    try:
+        rows = load_batch_source(args.source)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    journal = BatchJournal(args.journal or default_journal_path(args.source))
+    runner = BatchRunner(os.path.expanduser(args.output_dir), journal, args.workers, args.template)
+    try:
+        summary = runner.run(rows)
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the same command to resume.", file=sys.stderr)
+        return 130
+    print(format_summary(summary))
+    for failure in summary['failures']:
+        print(f"  failed: {failure['url']} {failure['start'] or ''}-{failure['end'] or ''}: {failure['error']}")
+    return 1 if summary['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Checks DBusNotificationBackend and Notifier against a stub notification server.
+
+Starts a private dbus-daemon, exports a stub org.freedesktop.Notifications on it (Notify hands
+out IDs and records every call; it answers slowly, to widen races) and talks to it through
+DBusNotificationBackend(bus_address=...). Checks the Notify signature, that updates for one
+key reuse the returned ID (direct, coalesced and concurrent updates alike), that different keys
+get different popups and that forget() starts a new popup. Exits with status 1 on a failure.
+
+    python3 benchmarks/dbus_notifications.py
+
+Needs dbus-daemon and PyGObject (gi), as the D-Bus backend does.
+"""
+import os
+import subprocess
+import sys
+import threading
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from notifications import (NOTIFICATIONS_BUS_NAME, NOTIFICATIONS_INTERFACE, NOTIFICATIONS_OBJECT_PATH,
+                           DBusNotificationBackend, Notifier, Gio, GLib)
+
+STUB_INTROSPECTION = f"""
+<node>
+  <interface name="{NOTIFICATIONS_INTERFACE}">
+    <method name="Notify">
+      <arg type="s" name="app_name" direction="in"/>
+      <arg type="u" name="replaces_id" direction="in"/>
+      <arg type="s" name="app_icon" direction="in"/>
+      <arg type="s" name="summary" direction="in"/>
+      <arg type="s" name="body" direction="in"/>
+      <arg type="as" name="actions" direction="in"/>
+      <arg type="a{{sv}}" name="hints" direction="in"/>
+      <arg type="i" name="expire_timeout" direction="in"/>
+      <arg type="u" name="id" direction="out"/>
+    </method>
+  </interface>
+</node>
+"""
+STUB_REPLY_DELAY = 0.02
+
+class StubNotificationServer:
+    """org.freedesktop.Notifications on its own connection and main loop thread. calls holds (replaces_id, summary, body, returned id)."""
+
+    def __init__(self, bus_address):
+        self.bus_address = bus_address
+        self.calls = []
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._error = None
+        threading.Thread(target=self._serve, daemon=True).start()
+        self._ready.wait(10)
+        if self._error or not self._ready.is_set():
+            raise RuntimeError(f"Stub notification server did not start: {self._error}")
+
+    def _serve(self):
+        try:
+            context = GLib.MainContext.new()
+            context.push_thread_default()
+            flags = Gio.DBusConnectionFlags.AUTHENTICATION_CLIENT | Gio.DBusConnectionFlags.MESSAGE_BUS_CONNECTION
+            connection = Gio.DBusConnection.new_for_address_sync(self.bus_address, flags, None, None)
+            interface = Gio.DBusNodeInfo.new_for_xml(STUB_INTROSPECTION).interfaces[0]
+            connection.register_object(NOTIFICATIONS_OBJECT_PATH, interface, self._handle_call, None, None)
+            connection.call_sync("org.freedesktop.DBus", "/org/freedesktop/DBus", "org.freedesktop.DBus", "RequestName",
+                                 GLib.Variant("(su)", (NOTIFICATIONS_BUS_NAME, 4)), GLib.VariantType("(u)"),
+                                 Gio.DBusCallFlags.NONE, -1, None)
+            loop = GLib.MainLoop.new(context, False)
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        loop.run()
+
+    def _handle_call(self, connection, sender, object_path, interface_name, method_name, parameters, invocation):
+        if method_name != "Notify":
+            invocation.return_dbus_error("org.freedesktop.DBus.Error.UnknownMethod", method_name)
+            return
+        _, replaces_id, _, summary, body, _, _, _ = parameters.unpack()
+        time.sleep(STUB_REPLY_DELAY)
+        with self._lock:
+            if replaces_id:
+                notification_id = replaces_id
+            else:
+                notification_id = self._next_id
+                self._next_id += 1
+            self.calls.append((replaces_id, summary, body, notification_id))
+        invocation.return_value(GLib.Variant("(u)", (notification_id,)))
+
+    def calls_for(self, summary):
+        with self._lock:
+            return [call for call in self.calls if call[1] == summary]
+
+def start_bus():
+    """Starts a private dbus-daemon. Returns (process, address)."""
+    process = subprocess.Popen(["dbus-daemon", "--session", "--nofork", "--nopidfile", "--print-address=1"],
+                               stdout=subprocess.PIPE, text=True)
+    address = process.stdout.readline().strip()
+    if not address:
+        process.kill()
+        raise RuntimeError("dbus-daemon did not print its address")
+    return process, address
+
+def check(results, name, ok, detail=""):
+    results.append(ok)
+    print(f"{name:52} {'ok' if ok else 'FAIL'}{'  ' + detail if detail and not ok else ''}")
+
+def run_checks(server, backend):
+    results = []
+
+    first_id = backend.notify("direct", "first")
+    second_id = backend.notify("direct", "second", first_id)
+    check(results, "Notify returns an ID", first_id > 0, f"got {first_id}")
+    check(results, "replaces_id updates the same popup", second_id == first_id, f"{first_id} then {second_id}")
+
+    notifier = Notifier(backend=backend, min_interval=0.1)
+    for i in range(5):
+        notifier.notify("job-a", f"progress {i}", key="a", coalesce=True)
+    notifier.notify("job-a", "done", key="a")
+    notifier.notify("job-b", "started", key="b")
+    time.sleep(0.3)
+    calls_a, calls_b = server.calls_for("job-a"), server.calls_for("job-b")
+    popups_a = {call[3] for call in calls_a}
+    check(results, "coalesced and direct updates share one popup", len(popups_a) == 1 and calls_a[0][0] == 0
+          and all(call[0] == calls_a[0][3] for call in calls_a[1:]), f"calls {calls_a}")
+    check(results, "coalesced updates are rate limited", len(calls_a) < 6, f"{len(calls_a)} Notify calls for 6 updates")
+    check(results, "different keys get different popups", calls_b and calls_b[0][3] not in popups_a, f"a {popups_a}, b {calls_b}")
+
+    notifier.forget("a")
+    notifier.notify("job-a", "again", key="a")
+    check(results, "forget() starts a new popup", server.calls_for("job-a")[-1][0] == 0, f"calls {server.calls_for('job-a')}")
+
+    # Before the first popup's ID comes back (the stub answers after STUB_REPLY_DELAY), a timer
+    # flush and direct updates from other threads must wait for it instead of opening more popups.
+    racing = Notifier(backend=backend, min_interval=STUB_REPLY_DELAY / 4)
+    start = threading.Barrier(4)
+    def send_direct(i):
+        start.wait()
+        racing.notify("job-race", f"direct {i}", key="race")
+    threads = [threading.Thread(target=send_direct, args=(i,)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    time.sleep(0.002)
+    racing.notify("job-race", "coalesced", key="race", coalesce=True) # Flushed by a timer while the first send is in flight
+    for thread in threads:
+        thread.join()
+    time.sleep(0.3)
+    calls_race = server.calls_for("job-race")
+    check(results, "concurrent sends for one key open one popup", len({call[3] for call in calls_race}) == 1,
+          f"calls {calls_race}")
+    return all(results)
+
+def main():
+    if Gio is None:
+        print("PyGObject (gi) is not available; the D-Bus backend can't be tested.")
+        return 1
+    bus, address = start_bus()
+    try:
+        server = StubNotificationServer(address)
+        backend = DBusNotificationBackend(bus_address=address)
+        return 0 if run_checks(server, backend) else 1
+    finally:
+        bus.terminate()
+        bus.wait()
+
+if __name__ == "__main__":
+    sys.exit(main())
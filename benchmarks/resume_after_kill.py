@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""Kill-and-resume test for the job journal.
+
+Each scenario runs a job in a child process (the real extension pipeline, with the stub
+yt-dlp/ffmpeg from benchmarks/stubs and the local media server from run_benchmarks.py),
+SIGKILLs the child and every process it started partway through, then starts a second child
+that resumes the unfinished job from the journal, as the extension does on startup. It checks
+that the resumed job finishes, that its one output file has the expected bytes (no second
+name reserved), and that a resumed download fetches less than the whole file again.
+
+    python3 benchmarks/resume_after_kill.py
+    python3 benchmarks/resume_after_kill.py --only full_download_parallel --keep
+
+Needs Ulauncher's Python API (the ulauncher package) to be importable, and Linux (/proc) to
+find the processes to kill.
+"""
+import argparse
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from run_benchmarks import REPO_DIR, STUBS_DIR, VIDEO_URL, CountingNotificationBackend, MediaServer
+
+sys.path.insert(0, REPO_DIR)
+
+def scenarios(size):
+    """(name, ItemEnterEvent data, preferences, kill condition, expects a partial resume) for every scenario.
+
+    A kill condition gets (bytes served so far, output directory) and returns True once the child should be killed.
+    """
+    cut = {'action_type': 'cut', 'url': VIDEO_URL, 'start': "00:02:00", 'end': "00:06:00"}
+    full = {'action_type': 'full_download', 'url': VIDEO_URL}
+    halfway = lambda served, output_dir: served >= size // 2
+    clip_started = lambda served, output_dir: any(size for _, size in _output_files(output_dir))
+    return [
+        ("full_download_parallel", full, {'ytc_download_connections': "4"}, halfway, True),
+        ("full_download_single", full, {'ytc_download_connections': "1"}, halfway, True),
+        ("cut_full_source", cut, {'ytc_section_download': "false"}, halfway, True),
+        # Killed while the clip is being written: the resumed job must overwrite the truncated clip.
+        ("cut_stream", cut, {'ytc_stream_cut': "true"}, clip_started, False),
+    ]
+
+def _output_files(output_dir):
+    """(path, size) of every output file, leaving out the filename counter."""
+    files = []
+    for root, _, names in os.walk(output_dir):
+        for name in names:
+            if not name.startswith("."):
+                path = os.path.join(root, name)
+                try:
+                    files.append((path, os.path.getsize(path)))
+                except OSError:
+                    pass
+    return files
+
+def _descendants(pid):
+    """PIDs of every live process below pid, found through /proc (jobs run their tools in new sessions)."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r", encoding="utf-8") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        parent = int(stat.rsplit(")", 1)[1].split()[1])
+        children.setdefault(parent, []).append(int(entry))
+    found, pending = [], [pid]
+    while pending:
+        for child in children.get(pending.pop(), []):
+            found.append(child)
+            pending.append(child)
+    return found
+
+def _kill_tree(process):
+    """SIGKILLs the process and everything it started, as a crash or power loss would."""
+    for pid in [process.pid] + _descendants(process.pid):
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    process.wait()
+
+def _start_child(scenario_dir, preferences, action=None):
+    command = [sys.executable, os.path.abspath(__file__), "--child", scenario_dir, json.dumps(preferences)]
+    if action is not None:
+        command.append(json.dumps(action))
+    log = open(os.path.join(scenario_dir, "resume.log" if action is None else "first_run.log"), "w", encoding="utf-8")
+    try:
+        return subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+    finally:
+        log.close()
+
+def run_scenario(name, action, preferences, kill_when, partial_resume, work_dir, server, media, timeout=300):
+    """Runs, kills and resumes one job. Returns the result dict; 'problems' lists what went wrong."""
+    scenario_dir = os.path.join(work_dir, name)
+    output_dir = os.path.join(scenario_dir, "output")
+    os.makedirs(output_dir)
+    preferences = dict({
+        'ytc_output_dir': output_dir,
+        'ytc_cache_dir': os.path.join(scenario_dir, "cache"),
+        'ytc_auto_open_dir': "false",
+        'ytc_metadata_lookup': "false",
+        'ytc_progress_notify_interval': "0",
+        'ytc_cache_max_mb': "0",
+    }, **preferences)
+    problems = []
+
+    served_before = server.bytes_served
+    child = _start_child(scenario_dir, preferences, action)
+    deadline = time.monotonic() + timeout
+    while not kill_when(server.bytes_served - served_before, output_dir):
+        if child.poll() is not None:
+            problems.append(f"the first run exited ({child.returncode}) before it could be killed")
+            break
+        if time.monotonic() > deadline:
+            problems.append("the kill condition was never reached")
+            break
+        time.sleep(0.01)
+    _kill_tree(child)
+    first_run_bytes = server.bytes_served - served_before
+    outputs_at_kill = _output_files(output_dir)
+
+    served_before = server.bytes_served
+    started = time.monotonic()
+    resumed = _start_child(scenario_dir, preferences)
+    try:
+        return_code = resumed.wait(timeout)
+    except subprocess.TimeoutExpired:
+        _kill_tree(resumed)
+        return_code = None
+        problems.append(f"the resumed job did not finish within {timeout}s")
+    resume_wall = time.monotonic() - started
+    resume_bytes = server.bytes_served - served_before
+    if return_code not in (0, None):
+        problems.append(f"the resumed run failed ({return_code}), see {scenario_dir}/resume.log")
+
+    outputs = _output_files(output_dir)
+    if action['action_type'] == 'full_download':
+        expected = media
+    else:
+        bytes_per_second = float(os.environ['YTC_BENCH_BYTES_PER_SECOND'])
+        skip = int(_seconds(action['start']) * bytes_per_second)
+        expected = media[skip:skip + int((_seconds(action['end']) - _seconds(action['start'])) * bytes_per_second)]
+    if len(outputs) != 1:
+        problems.append(f"expected one output file, found {len(outputs)}: {', '.join(os.path.basename(p) for p, _ in outputs)}")
+    elif outputs_at_kill and outputs[0][0] != outputs_at_kill[0][0]:
+        problems.append(f"the output moved from its reserved name {outputs_at_kill[0][0]} to {outputs[0][0]}")
+    for path, _ in outputs[:1]:
+        with open(path, "rb") as f:
+            if f.read() != expected:
+                problems.append(f"{os.path.basename(path)} does not have the expected {len(expected)} bytes")
+    if partial_resume and resume_bytes >= len(media):
+        problems.append(f"the resumed download fetched {resume_bytes} bytes, no less than the whole file ({len(media)})")
+
+    return {
+        'first_run_mb': round(first_run_bytes / (1024 * 1024), 3),
+        'output_at_kill_bytes': sum(size for _, size in outputs_at_kill),
+        'resume_mb': round(resume_bytes / (1024 * 1024), 3),
+        'resume_wall_s': round(resume_wall, 3),
+        'problems': problems,
+    }
+
+def _seconds(time_str):
+    total = 0.0
+    for part in time_str.split(":"):
+        total = total * 60 + float(part)
+    return total
+
+def child_main(scenario_dir, preferences_json, action_json=None):
+    """Runs inside the child: submits action (first run) or resumes the journal (second run), then waits for the jobs."""
+    from main import YouTubeVideoCutterExtension
+    from notifications import Notifier
+    from ulauncher.api.shared.event import ItemEnterEvent
+
+    extension = YouTubeVideoCutterExtension()
+    extension.preferences.update(json.loads(preferences_json))
+    extension.notifier = Notifier(backend=CountingNotificationBackend())
+    if action_json is not None:
+        extension.item_enter_listener.on_event(ItemEnterEvent(json.loads(action_json)), extension)
+    else:
+        extension.resume_unfinished_jobs()
+        if not extension.get_job_engine().list_jobs(active_only=False):
+            print(f"No unfinished job to resume in {scenario_dir}", flush=True)
+            return 1
+    engine = extension.get_job_engine()
+    while engine.list_jobs(active_only=True):
+        time.sleep(0.02)
+    jobs = engine.list_jobs(active_only=False)
+    engine.shutdown()
+    return 0 if all(job.state == "done" for job in jobs) else 1
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kill jobs mid-way and check that they resume from the job journal.")
+    parser.add_argument("--size-mb", type=int, default=64, help="size of the synthetic media file (default: 64)")
+    parser.add_argument("--duration", type=int, default=600, help="length the media file pretends to have, in seconds (default: 600)")
+    parser.add_argument("--throttle-kbps", type=int, default=4096, help="per-connection server limit in KiB/s (default: 4096)")
+    parser.add_argument("--only", help="comma separated scenario names to run")
+    parser.add_argument("--keep", action="store_true", help="keep the work directory (outputs, journals and logs)")
+    parser.add_argument("--child", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        return child_main(*args.child)
+
+    try:
+        import ulauncher.api.shared.event # noqa: F401
+    except ImportError:
+        parser.error("the resume test needs Ulauncher's Python API (the ulauncher package) to be importable")
+
+    work_dir = tempfile.mkdtemp(prefix="ytc-resume-")
+    media_path = os.path.join(work_dir, "media.mp4")
+    media = os.urandom(args.size_mb * 1024 * 1024)
+    with open(media_path, "wb") as f:
+        f.write(media)
+    server = MediaServer(media_path, args.throttle_kbps * 1024)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ.update({
+        'PATH': STUBS_DIR + os.pathsep + os.environ.get('PATH', ''),
+        'YTC_BENCH_MEDIA_URL': server.url,
+        'YTC_BENCH_DURATION': str(args.duration),
+        'YTC_BENCH_BYTES_PER_SECOND': str(len(media) / args.duration),
+    })
+
+    only = set(args.only.split(",")) if args.only else None
+    failed = False
+    try:
+        for name, action, preferences, kill_when, partial_resume in scenarios(len(media)):
+            if only and name not in only:
+                continue
+            result = run_scenario(name, action, preferences, kill_when, partial_resume, work_dir, server, media)
+            failed |= bool(result['problems'])
+            print(f"{name:24} killed after {result['first_run_mb']:8.3f} MB (output {result['output_at_kill_bytes']} bytes), "
+                  f"resumed with {result['resume_mb']:8.3f} MB in {result['resume_wall_s']:7.3f}s  "
+                  f"{'FAIL: ' + '; '.join(result['problems']) if result['problems'] else 'ok'}")
+    finally:
+        server.shutdown()
+        if args.keep or failed:
+            print(f"Outputs, journals and logs kept in {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""Offline benchmarks for the cut/download pipeline.
+
+Runs jobs through the real ItemEnterEventListener / job engine pipeline against the stub
+yt-dlp and ffmpeg in benchmarks/stubs and a local media server (optionally throttled per
+connection, like a video CDN), with tracing enabled. Reports wall time, throughput, spawned
+processes, notifications and per-span timings for each scenario. Needs Ulauncher's Python API
+(the ulauncher package) to be importable, as when running the extension itself.
+
+    python3 benchmarks/run_benchmarks.py --output results.json
+    python3 benchmarks/run_benchmarks.py --baseline results.json   # flag regressions against an earlier run
+    python3 benchmarks/run_benchmarks.py --smart-cut 10,300        # real ffmpeg: smart cut vs full re-encode
+"""
+import argparse
+import http.server
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUBS_DIR = os.path.join(REPO_DIR, "benchmarks", "stubs")
+sys.path.insert(0, REPO_DIR)
+
+import tracing
+from notifications import Notifier
+
+VIDEO_URL = "https://www.youtube.com/watch?v=benchvideo"
+
+class MediaServer(http.server.ThreadingHTTPServer):
+    """Serves one file with HTTP range support, at most rate bytes/s per connection (0 = unlimited)."""
+    daemon_threads = True
+
+    def __init__(self, media_path, rate=0):
+        with open(media_path, "rb") as f:
+            self.media = f.read()
+        self.rate = rate
+        self.bytes_served = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        super().__init__(("127.0.0.1", 0), MediaRequestHandler)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/media.mp4"
+
+    def count(self, requests=0, bytes_served=0):
+        with self._lock:
+            self.requests += requests
+            self.bytes_served += bytes_served
+
+class MediaRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, so pooled connections are actually reused
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        media = self.server.media
+        first, last = 0, len(media) - 1
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            first = int(match.group(1))
+            last = min(last, int(match.group(2))) if match.group(2) else last
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {first}-{last}/{len(media)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(last + 1 - first))
+        self.send_header("Content-Type", "video/mp4")
+        self.end_headers()
+        self.server.count(requests=1)
+        started, sent = time.monotonic(), 0
+        try:
+            for offset in range(first, last + 1, 64 * 1024):
+                chunk = media[offset:min(offset + 64 * 1024, last + 1)]
+                self.wfile.write(chunk)
+                sent += len(chunk)
+                self.server.count(bytes_served=len(chunk))
+                if self.server.rate:
+                    delay = sent / self.server.rate - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+        except (BrokenPipeError, ConnectionResetError):
+            pass # Clients stop reading early (stream cuts, cancelled jobs)
+
+class CountingNotificationBackend:
+    """Notification backend that only counts, so benchmarks don't pop up anything."""
+
+    def __init__(self):
+        self.count = 0
+
+    def notify(self, title, text, replaces_id=0):
+        self.count += 1
+        return self.count
+
+def summarize_trace(trace_path):
+    """Per span name totals from a trace file, plus the subprocesses spawned overall (counted on top-level spans only)."""
+    spans = defaultdict(lambda: {'count': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'child_cpu_s': 0.0, 'spawns': 0})
+    total_spawns = 0
+    if not os.path.exists(trace_path):
+        return {}, 0
+    with open(trace_path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record['parent'] is None:
+                total_spawns += record['spawns']
+            summary = spans[record['name']]
+            summary['count'] += 1
+            for field in ('wall_s', 'cpu_s', 'child_cpu_s'):
+                summary[field] += record[field]
+            summary['spawns'] += record['spawns']
+    return {name: {field: round(value, 4) if isinstance(value, float) else value for field, value in summary.items()}
+            for name, summary in spans.items()}, total_spawns
+
+def run_scenario(name, actions, preferences, work_dir, server, timeout=600):
+    """Submits actions through a fresh extension instance and waits for all its jobs."""
+    from main import YouTubeVideoCutterExtension
+    from ulauncher.api.shared.event import ItemEnterEvent
+
+    scenario_dir = os.path.join(work_dir, name)
+    extension = YouTubeVideoCutterExtension()
+    extension.preferences.update({
+        'ytc_output_dir': os.path.join(scenario_dir, "output"),
+        'ytc_cache_dir': os.path.join(scenario_dir, "cache"),
+        'ytc_auto_open_dir': "false",
+        'ytc_metadata_lookup': "false",
+        'ytc_progress_notify_interval': "0",
+        'ytc_cache_max_mb': "0",
+    })
+    extension.preferences.update(preferences)
+    backend = CountingNotificationBackend()
+    extension.notifier = Notifier(backend=backend)
+    trace_path = os.path.join(scenario_dir, "trace.jsonl")
+    tracing.configure(trace_path)
+    served_before = server.bytes_served
+    started = time.monotonic()
+    for round_actions in actions:
+        for data in round_actions:
+            extension.item_enter_listener.on_event(ItemEnterEvent(dict(data)), extension)
+        deadline = time.monotonic() + timeout
+        while extension.get_job_engine().list_jobs(active_only=True):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Scenario {name} did not finish within {timeout}s")
+            time.sleep(0.02)
+    wall = time.monotonic() - started
+    tracing.configure(None)
+    extension.get_job_engine().shutdown()
+
+    jobs = extension.get_job_engine().list_jobs(active_only=False)
+    output_dir = extension.preferences['ytc_output_dir']
+    output_bytes = sum(os.path.getsize(os.path.join(root, file)) for root, _, files in os.walk(output_dir) for file in files)
+    downloaded = server.bytes_served - served_before
+    spans, spawns = summarize_trace(trace_path)
+    return {
+        'wall_s': round(wall, 4),
+        'jobs': len(jobs),
+        'failed': sum(1 for job in jobs if job.state != "done"),
+        'job_wall_s_mean': round(sum(job.finished_at - job.started_at for job in jobs) / max(len(jobs), 1), 4),
+        'downloaded_mb': round(downloaded / (1024 * 1024), 3),
+        'download_mb_per_s': round(downloaded / (1024 * 1024) / max(wall, 0.001), 3),
+        'output_mb': round(output_bytes / (1024 * 1024), 3),
+        'spawns': spawns,
+        'notifications': backend.count,
+        'spans': spans,
+    }
+
+def scenarios(manifest_path):
+    """(name, rounds of ItemEnterEvent data, preferences) for every pipeline benchmark."""
+    cuts = [{'action_type': 'cut', 'url': VIDEO_URL, 'start': start, 'end': end}
+            for start, end in (("00:00:30", "00:01:00"), ("00:03:00", "00:03:20"), ("00:07:00", "00:08:00"))]
+    multi_cut = {'action_type': 'multi_cut', 'url': VIDEO_URL, 'segments': [["00:01:00", "00:01:30"], ["00:02:00", "00:02:30"], ["00:04:00", "00:04:10"]],
+                 'concat': True, 'start': "00:01:00", 'end': "00:04:10"}
+    full = {'action_type': 'full_download', 'url': VIDEO_URL}
+    return [
+        ("cut_section", [cuts], {'ytc_section_download': "true"}),
+        ("cut_full_source", [cuts], {'ytc_section_download': "false"}),
+        ("cut_cached", [cuts[:1], cuts], {'ytc_section_download': "false", 'ytc_cache_max_mb': "4096"}),
+        ("cut_stream", [cuts], {'ytc_stream_cut': "true"}),
+        ("multi_cut_concat", [[multi_cut]], {'ytc_section_download': "true"}),
+        ("full_download_1_connection", [[full]], {'ytc_download_connections': "1"}),
+        ("full_download_4_connections", [[full]], {'ytc_download_connections': "4"}),
+        ("batch_manifest", [[{'action_type': 'batch', 'source': manifest_path}]], {'ytc_batch_workers': "2"}),
+    ]
+
+def write_manifest(path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("url,start,end\n")
+        for video in ("benchvideo1", "benchvideo2"):
+            for start in range(0, 300, 60):
+                f.write(f"https://www.youtube.com/watch?v={video},{start},{start + 20}\n")
+
+def bench_smart_cut(lengths, work_dir):
+    """Smart cut against a full re-encode for clips of the given lengths (seconds), with the real ffmpeg."""
+    from video_cutter_lib import smart_cut_video, seconds_to_time
+    source_seconds = max(lengths) + 60
+    source_path = os.path.join(work_dir, "smart_cut_source.mp4")
+    subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"testsrc2=size=640x360:rate=30:duration={source_seconds}",
+                    "-f", "lavfi", "-i", f"sine=frequency=440:duration={source_seconds}", "-c:v", "libx264", "-preset", "veryfast",
+                    "-g", "120", "-c:a", "aac", "-shortest", source_path], check=True)
+    results = {}
+    for length in lengths:
+        start, end = seconds_to_time(17.5), seconds_to_time(17.5 + length)
+        timings = {}
+        for mode in ("smart_cut", "full_reencode"):
+            output_path = os.path.join(work_dir, f"{mode}_{length}.mp4")
+            wall_before, cpu_before = time.perf_counter(), _children_cpu()
+            if mode == "smart_cut":
+                smart_cut_video(source_path, start, end, output_path)
+            else:
+                subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-ss", start, "-to", end, "-i", source_path,
+                                "-c:v", "libx264", "-preset", "veryfast", "-c:a", "aac", output_path], check=True)
+            timings[mode] = {'wall_s': round(time.perf_counter() - wall_before, 3), 'cpu_s': round(_children_cpu() - cpu_before, 3)}
+        results[f"smart_cut_{length}s"] = timings
+    return results
+
+def _children_cpu():
+    usage = os.times()
+    return usage.children_user + usage.children_system
+
+def compare(results, baseline, tolerance):
+    """Prints wall time changes against a baseline run. Returns the names of regressed scenarios."""
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if not old or 'wall_s' not in result or 'wall_s' not in old:
+            continue
+        change = (result['wall_s'] - old['wall_s']) / max(old['wall_s'], 0.001)
+        flag = ""
+        if change > tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:32} {old['wall_s']:9.3f}s -> {result['wall_s']:9.3f}s ({change:+.1%}){flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the YouTube Video Cutter pipeline.")
+    parser.add_argument("--size-mb", type=int, default=64, help="size of the synthetic media file (default: 64)")
+    parser.add_argument("--duration", type=int, default=600, help="length the media file pretends to have, in seconds (default: 600)")
+    parser.add_argument("--throttle-kbps", type=int, default=4096, help="per-connection server limit in KiB/s, 0 = unlimited (default: 4096)")
+    parser.add_argument("--only", help="comma separated scenario names to run")
+    parser.add_argument("--smart-cut", metavar="LENGTHS", help="also benchmark smart cut vs full re-encode with the real ffmpeg, e.g. 10,300,3600")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="wall time increase reported as a regression (default: 0.10)")
+    parser.add_argument("--keep", action="store_true", help="keep the work directory (outputs and traces)")
+    args = parser.parse_args(argv)
+
+    try:
+        import ulauncher.api.shared.event # noqa: F401
+    except ImportError:
+        parser.error("the pipeline benchmarks need Ulauncher's Python API (the ulauncher package) to be importable")
+
+    work_dir = tempfile.mkdtemp(prefix="ytc-bench-")
+    media_path = os.path.join(work_dir, "media.mp4")
+    with open(media_path, "wb") as f:
+        f.write(os.urandom(args.size_mb * 1024 * 1024))
+    server = MediaServer(media_path, args.throttle_kbps * 1024)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ.update({
+        'PATH': STUBS_DIR + os.pathsep + os.environ.get('PATH', ''),
+        'YTC_BENCH_MEDIA_URL': server.url,
+        'YTC_BENCH_DURATION': str(args.duration),
+        'YTC_BENCH_BYTES_PER_SECOND': str(args.size_mb * 1024 * 1024 / args.duration),
+    })
+    manifest_path = os.path.join(work_dir, "manifest.csv")
+    write_manifest(manifest_path)
+
+    only = set(args.only.split(",")) if args.only else None
+    results = {}
+    try:
+        for name, actions, preferences in scenarios(manifest_path):
+            if only and name not in only:
+                continue
+            results[name] = run_scenario(name, actions, preferences, work_dir, server)
+            result = results[name]
+            print(f"{name:32} {result['wall_s']:8.3f}s  {result['download_mb_per_s']:8.2f} MB/s  jobs {result['jobs']} "
+                  f"(failed {result['failed']})  spawns {result['spawns']}  notifications {result['notifications']}")
+            for span_name, span in sorted(result['spans'].items()):
+                print(f"    {span_name:30} x{span['count']:<4} wall {span['wall_s']:8.3f}s  cpu {span['cpu_s']:7.3f}s  "
+                      f"child cpu {span['child_cpu_s']:7.3f}s  spawns {span['spawns']}")
+        if args.smart_cut:
+            os.environ['PATH'] = os.environ['PATH'].split(os.pathsep, 1)[1] # The real ffmpeg/ffprobe
+            if shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
+                print("Skipping the smart cut benchmark: ffmpeg/ffprobe not found.")
+            else:
+                for name, timings in bench_smart_cut([int(length) for length in args.smart_cut.split(",")], work_dir).items():
+                    results[name] = timings['smart_cut']
+                    results[name]['full_reencode'] = timings['full_reencode']
+                    print(f"{name:32} smart {timings['smart_cut']['wall_s']:8.3f}s (cpu {timings['smart_cut']['cpu_s']:.3f}s)  "
+                          f"full re-encode {timings['full_reencode']['wall_s']:8.3f}s (cpu {timings['full_reencode']['cpu_s']:.3f}s)")
+    finally:
+        server.shutdown()
+        if args.keep:
+            print(f"Outputs and traces kept in {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    failed = [name for name, result in results.items() if result.get('failed')]
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    return 1 if failed or regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Stress test for OutputNamer's parallel allocation.
+
+Several processes, each running several threads, allocate names from the same output
+directory at once, through the {n} counter (flock) path, with {n} in the file name and in a
+subdirectory name, and through the fixed-name (O_EXCL suffix) path. Every returned name must
+be unique and exist on disk, and the {n} names must form one gap-free sequence. Exits with
+status 1 on any collision.
+
+    python3 benchmarks/stress_output_naming.py
+    python3 benchmarks/stress_output_naming.py --processes 8 --threads 8 --names 200
+"""
+import argparse
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from output_naming import OutputNamer
+
+TEMPLATES = {
+    "counter": "{n}.mp4",
+    "counter_dir": "{n}/{title}.mp4",
+    "fixed": "{id}/{title}_{start}.mp4",
+}
+
+def allocate_names(directory, template, threads, names):
+    """Allocates threads * names paths from one process. Returns them in allocation order per thread."""
+    namer = OutputNamer(directory, template)
+    results = [[] for _ in range(threads)]
+    start = threading.Barrier(threads)
+
+    def worker(index):
+        start.wait()
+        for _ in range(names):
+            results[index].append(namer.allocate(title="Stress test", video_id="stress", start="00:01:00", end="00:02:00"))
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return [path for paths in results for path in paths]
+
+def run(directory, template_name, processes, threads, names):
+    """Runs one allocation storm. Returns a list of problems (empty when every name is unique)."""
+    template = TEMPLATES[template_name]
+    started = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        batches = pool.starmap(allocate_names, [(directory, template, threads, names)] * processes)
+    elapsed = time.perf_counter() - started
+    paths = [path for batch in batches for path in batch]
+    expected = processes * threads * names
+
+    problems = []
+    duplicates = len(paths) - len(set(paths))
+    if duplicates:
+        problems.append(f"{duplicates} duplicate names")
+    if len(paths) != expected:
+        problems.append(f"{len(paths)} names allocated, expected {expected}")
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        problems.append(f"{len(missing)} reserved names missing on disk (e.g. {missing[0]})")
+    if "{n}" in template:
+        numbers = sorted(int(re.match(r"\d+", os.path.relpath(path, directory)).group()) for path in paths)
+        if numbers != list(range(1, expected + 1)):
+            problems.append(f"counter sequence has gaps or repeats ({numbers[:3]}...{numbers[-3:]})")
+    print(f"{template_name:<11} {expected:>6} names  {processes} processes x {threads} threads  "
+          f"{elapsed:.3f}s ({expected / max(elapsed, 1e-9):.0f} names/s)  {'FAIL: ' + '; '.join(problems) if problems else 'ok'}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress test parallel output name allocation.")
+    parser.add_argument("--processes", type=int, default=4, help="allocating processes (default: 4)")
+    parser.add_argument("--threads", type=int, default=4, help="threads per process (default: 4)")
+    parser.add_argument("--names", type=int, default=50, help="names allocated per thread (default: 50)")
+    parser.add_argument("--keep", action="store_true", help="keep the output directories")
+    args = parser.parse_args()
+
+    failed = False
+    for template_name in TEMPLATES:
+        directory = tempfile.mkdtemp(prefix=f"ytc-naming-{template_name}-")
+        try:
+            failed |= bool(run(directory, template_name, args.processes, args.threads, args.names))
+        finally:
+            if args.keep:
+                print(f"    kept {directory}")
+            else:
+                shutil.rmtree(directory, ignore_errors=True)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
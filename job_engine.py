@@ -0,0 +1,258 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    from .tracing import span
+except ImportError:
+    from tracing import span
+
+try:
+    from .video_cutter_lib import kill_process_group
+except ImportError:
+    from video_cutter_lib import kill_process_group
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+class JobCancelled(Exception):
+    """Raised inside a job runner once the job has been cancelled."""
+
+class Job:
+    """A single queued cut/download request and its runtime state."""
+
+    def __init__(self, job_id, action_type, data, priority=0, key=None, checkpoint=None):
+        self.id = job_id
+        self.key = key or uuid.uuid4().hex # Survives restarts, unlike id
+        self.checkpoint = checkpoint or {}
+        self.action_type = action_type
+        self.data = data
+        self.priority = priority
+        self.state = JOB_QUEUED
+        self.progress = ""
+        self.phase = ""
+        self.error = None
+        self.result = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.last_notification_time = 0
+        self.last_reported_percentage_str = ""
+        self._processes = []
+        self._lock = threading.Lock()
+        self._cancel_requested = False
+        self._on_checkpoint = None
+
+    @property
+    def cancelled(self):
+        return self._cancel_requested
+
+    @property
+    def active(self):
+        return self.state in (JOB_QUEUED, JOB_RUNNING)
+
+    def attach_process(self, process):
+        """Registers a yt-dlp/ffmpeg Popen so cancel() can kill it."""
+        with self._lock:
+            self._processes = [p for p in self._processes if p.poll() is None]
+            self._processes.append(process)
+            cancelled = self._cancel_requested
+        if cancelled:
+            _kill_process(process)
+
+    def save_checkpoint(self, phase, **artifacts):
+        """Records the last completed phase and partial artifact paths, so a restarted job can resume from them."""
+        self.checkpoint = {'phase': phase, 'artifacts': dict(self.checkpoint.get('artifacts', {}), **artifacts)}
+        if self._on_checkpoint:
+            self._on_checkpoint(self)
+
+    def check_cancelled(self):
+        if self._cancel_requested:
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    def cancel(self):
+        with self._lock:
+            self._cancel_requested = True
+            processes = list(self._processes)
+        for process in processes:
+            _kill_process(process)
+
+    def describe(self):
+        """Short human readable summary used by the job list."""
+        url = self.data.get('url', '')
+        if self.action_type == 'cut':
+            return f"Cut {self.data.get('start')}-{self.data.get('end')}: {url}"
+        if self.action_type == 'multi_cut':
+            return f"Cut {len(self.data.get('segments', []))} clips{' (concat)' if self.data.get('concat') else ''}: {url}"
+        if self.action_type == 'full_download':
+            return f"Full download: {url}"
+        if self.action_type == 'batch':
+            return f"Batch: {self.data.get('source')}"
+        return f"{self.action_type}: {url}"
+
+def _kill_process(process):
+    try:
+        kill_process_group(process) # yt-dlp's own ffmpeg children must not outlive a cancelled job
+    except OSError as e:
+        logger.warning(f"Could not kill process {process.pid}: {e}")
+
+class JobEngine:
+    """Bounded in-process worker pool for cut/download jobs.
+
+    Jobs are taken from a priority queue (lower priority value first, FIFO within a priority).
+    Runners acquire download_slot()/ffmpeg_slot() around each phase, so network and ffmpeg
+    concurrency are limited independently of the number of queued jobs. With a journal (see
+    JobJournal), submissions, checkpoints and final states are persisted so resume() can requeue
+    jobs that were interrupted by a restart.
+    """
+
+    def __init__(self, runner, max_downloads=2, max_ffmpeg=1, history_size=20, journal=None):
+        self._runner = runner
+        self._journal = journal
+        self._max_workers = max(1, max_downloads) + max(1, max_ffmpeg)
+        self._download_slots = threading.BoundedSemaphore(max(1, max_downloads))
+        self._ffmpeg_slots = threading.BoundedSemaphore(max(1, max_ffmpeg))
+        self._history_size = history_size
+        self._queue = []
+        self._jobs = {}
+        self._counter = itertools.count(1)
+        self._cond = threading.Condition()
+        self._workers = []
+        self._shutdown = False
+
+    def submit(self, action_type, data, priority=0, key=None, checkpoint=None):
+        """Queues a job and returns it immediately."""
+        with self._cond:
+            job_id = next(self._counter)
+            job = Job(job_id, action_type, data, priority, key, checkpoint)
+            if self._journal is not None:
+                job._on_checkpoint = self._journal.record_checkpoint
+                self._journal.record_submitted(job)
+            self._jobs[job_id] = job
+            heapq.heappush(self._queue, (priority, job_id, job))
+            self._ensure_workers()
+            self._cond.notify()
+        logger.info(f"Job {job_id} queued: {job.describe()}")
+        return job
+
+    def resume(self, entries):
+        """Requeues jobs recovered from the journal (see JobJournal.take_recovered) and returns them."""
+        jobs = [self.submit(entry['action_type'], entry['data'], entry['priority'], entry['key'], entry['checkpoint']) for entry in entries]
+        for job in jobs:
+            logger.info(f"Job {job.id} resumed from phase '{job.checkpoint.get('phase', 'queued')}'.")
+        return jobs
+
+    def cancel(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+        if job is None or not job.active:
+            return False
+        job.cancel()
+        with self._cond:
+            if job.state == JOB_QUEUED:
+                self._finish(job, JOB_CANCELLED)
+        logger.info(f"Job {job_id} cancelled.")
+        return True
+
+    def get(self, job_id):
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self, active_only=True):
+        with self._cond:
+            jobs = list(self._jobs.values())
+        if active_only:
+            jobs = [job for job in jobs if job.active]
+        return sorted(jobs, key=lambda job: job.id)
+
+    @contextmanager
+    def download_slot(self, job):
+        with self._slot(self._download_slots, job, "download"):
+            yield
+
+    @contextmanager
+    def ffmpeg_slot(self, job):
+        with self._slot(self._ffmpeg_slots, job, "ffmpeg"):
+            yield
+
+    @contextmanager
+    def _slot(self, semaphore, job, phase):
+        job.phase = f"waiting for {phase} slot"
+        while not semaphore.acquire(timeout=0.5):
+            job.check_cancelled()
+        try:
+            job.check_cancelled()
+            job.phase = phase
+            yield
+        finally:
+            semaphore.release()
+
+    def shutdown(self, cancel_running=True):
+        with self._cond:
+            self._shutdown = True
+            jobs = list(self._jobs.values())
+            self._cond.notify_all()
+        if cancel_running:
+            for job in jobs:
+                if job.active:
+                    job.cancel()
+
+    def _ensure_workers(self):
+        self._workers = [worker for worker in self._workers if worker.is_alive()]
+        while len(self._workers) < self._max_workers:
+            worker = threading.Thread(target=self._worker_loop, name=f"ytc-worker-{len(self._workers) + 1}", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._shutdown:
+                    self._cond.wait()
+                if self._shutdown:
+                    return
+                _, _, job = heapq.heappop(self._queue)
+                if job.state != JOB_QUEUED:
+                    continue
+                job.state = JOB_RUNNING
+                job.started_at = time.time()
+            self._run(job)
+
+    def _run(self, job):
+        try:
+            job.check_cancelled()
+            with span("job", job=job.id, action_type=job.action_type, queued_s=round(job.started_at - job.created_at, 6)):
+                job.result = self._runner(job)
+            state = JOB_CANCELLED if job.cancelled else JOB_DONE
+        except JobCancelled:
+            state = JOB_CANCELLED
+        except Exception as e:
+            if job.cancelled:
+                state = JOB_CANCELLED
+            else:
+                logger.error(f"Job {job.id} failed: {e}", exc_info=True)
+                job.error = e
+                state = JOB_FAILED
+        with self._cond:
+            self._finish(job, state)
+        logger.info(f"Job {job.id} finished: {state}")
+
+    def _finish(self, job, state):
+        job.state = state
+        job.phase = ""
+        job.finished_at = time.time()
+        if self._journal is not None:
+            self._journal.record_finished(job)
+            self._journal.remove_work_dir(job.key)
+        finished = [j for j in self._jobs.values() if not j.active]
+        for old_job in sorted(finished, key=lambda j: j.id)[:-self._history_size or None]:
+            del self._jobs[old_job.id]
@@ -0,0 +1,111 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILENAME = "jobs.jsonl"
+WORK_DIRNAME = "work"
+
+class JobJournal:
+    """Append-only JSONL journal of jobs, used to resume unfinished jobs after a restart.
+
+    Each line is one event for a job key: "submitted" (action type, data, priority), "checkpoint"
+    (phase and partial artifact paths) or "finished" (final state). Lines are fsynced as they are
+    written, so a crash loses at most the line being written; a torn last line is ignored.
+    Opening the journal folds it into the jobs that never finished (available as `recovered`)
+    and compacts the file down to those jobs. Each job keeps its partial downloads in a stable
+    work directory (work/<key>) next to the journal, which survives restarts.
+    """
+
+    def __init__(self, directory):
+        self.directory = os.path.expanduser(directory)
+        self.path = os.path.join(self.directory, JOURNAL_FILENAME)
+        self.work_root = os.path.join(self.directory, WORK_DIRNAME)
+        self._lock = threading.Lock()
+        os.makedirs(self.work_root, exist_ok=True)
+        self.recovered = self._load()
+        self._compact(self.recovered)
+        self._remove_orphaned_work_dirs({entry['key'] for entry in self.recovered})
+
+    def work_dir(self, key):
+        """Returns (and creates) the stable work directory of a job."""
+        path = os.path.join(self.work_root, key)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def remove_work_dir(self, key):
+        shutil.rmtree(os.path.join(self.work_root, key), ignore_errors=True)
+
+    def record_submitted(self, job):
+        self._append({'key': job.key, 'event': 'submitted', 'action_type': job.action_type,
+                      'data': job.data, 'priority': job.priority, 'checkpoint': job.checkpoint})
+
+    def record_checkpoint(self, job):
+        self._append({'key': job.key, 'event': 'checkpoint', 'checkpoint': job.checkpoint})
+
+    def record_finished(self, job):
+        self._append({'key': job.key, 'event': 'finished', 'state': job.state})
+
+    def take_recovered(self):
+        """Returns the unfinished jobs found when the journal was opened, once."""
+        with self._lock:
+            recovered, self.recovered = self.recovered, []
+        return recovered
+
+    def _append(self, entry):
+        entry['time'] = time.time()
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+                    f.flush()
+                    os.fsync(f.fileno())
+            except OSError as e:
+                logger.warning(f"Could not write job journal {self.path}: {e}")
+
+    def _load(self):
+        jobs = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Skipping unreadable line in job journal {self.path}")
+                        continue
+                    key, event = entry.get('key'), entry.get('event')
+                    if event == 'submitted':
+                        jobs[key] = {'key': key, 'action_type': entry['action_type'], 'data': entry['data'],
+                                     'priority': entry.get('priority', 0), 'checkpoint': entry.get('checkpoint') or {}}
+                    elif event == 'checkpoint' and key in jobs:
+                        jobs[key]['checkpoint'] = entry['checkpoint']
+                    elif event == 'finished':
+                        jobs.pop(key, None)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not read job journal {self.path}: {e}")
+        return list(jobs.values())
+
+    def _compact(self, unfinished):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in unfinished:
+                    f.write(json.dumps(dict(entry, event='submitted', time=time.time())) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not compact job journal {self.path}: {e}")
+
+    def _remove_orphaned_work_dirs(self, keep):
+        for name in os.listdir(self.work_root):
+            if name not in keep:
+                logger.info(f"Removing work directory of finished job {name}")
+                shutil.rmtree(os.path.join(self.work_root, name), ignore_errors=True)
@@ -1,50 +1,72 @@
 import logging
 import os
 import tempfile
+import shutil
 import subprocess
 import re
+import threading
 import time 
+from contextlib import contextmanager
 from ulauncher.api.client.Extension import Extension
 from ulauncher.api.client.EventListener import EventListener
-from ulauncher.api.shared.event import KeywordQueryEvent, ItemEnterEvent
+from ulauncher.api.shared.event import KeywordQueryEvent, ItemEnterEvent, PreferencesEvent, PreferencesUpdateEvent
 from ulauncher.api.shared.item.ExtensionResultItem import ExtensionResultItem
 from ulauncher.api.shared.action.RenderResultListAction import RenderResultListAction
 from ulauncher.api.shared.action.HideWindowAction import HideWindowAction
 from ulauncher.api.shared.action.DoNothingAction import DoNothingAction
 from ulauncher.api.shared.action.ExtensionCustomAction import ExtensionCustomAction
-from ulauncher.api.shared.action.OpenAction import OpenAction
 
 try:
-    from .video_cutter_lib import download_video, cut_video, download_full_video
+    from .video_cutter_lib import download_video, download_section, cut_video, smart_cut_video, stream_cut_video, cut_segments, concat_videos, download_full_video, download_full_video_parallel, time_to_seconds, seconds_to_time, normalize_video_id, estimate_range_bytes
 except ImportError:
-    try:
-        from video_cutter_lib import download_video, cut_video, download_full_video
-    except ImportError as e:
-        logger = logging.getLogger(__name__) # Ensure logger is defined before use
-        logger.error(f"Could not import video_cutter_lib: {e}")
-        import subprocess
-        def download_video(url, output_path, progress_callback=None):
-            logger.info(f"Downloading video (fallback): {url} -> {output_path}")
-            subprocess.run(["yt-dlp", "--no-playlist", "-f", "best", "-o", output_path, url], check=True)
-            if progress_callback: progress_callback("100%")
-        def cut_video(input_path, start_time, end_time, output_path):
-            logger.info(f"Cutting video (fallback): {input_path} [{start_time}-{end_time}] -> {output_path}")
-            subprocess.run(["ffmpeg", "-ss", start_time, "-to", end_time, "-i", input_path, "-c", "copy", output_path], check=True)
-        def download_full_video(url, full_output_path, progress_callback=None):
-            logger.info(f"Downloading full video (fallback): {url} -> {full_output_path}")
-            subprocess.run(["yt-dlp", "--no-playlist", "--merge-output-format", "mp4", "-o", full_output_path, url], check=True)
-            if progress_callback: progress_callback("100%")
-            return full_output_path
+    from video_cutter_lib import download_video, download_section, cut_video, smart_cut_video, stream_cut_video, cut_segments, concat_videos, download_full_video, download_full_video_parallel, time_to_seconds, seconds_to_time, normalize_video_id, estimate_range_bytes
+
+try:
+    from .media_cache import SourceCache
+except ImportError:
+    from media_cache import SourceCache
+
+try:
+    from .notifications import Notifier
+except ImportError:
+    from notifications import Notifier
+
+try:
+    from .output_naming import OutputNamer
+except ImportError:
+    from output_naming import OutputNamer
+
+try:
+    from .metadata_probe import MetadataProbe
+except ImportError:
+    from metadata_probe import MetadataProbe
+
+try:
+    from .batch import BatchJournal, BatchRunner, load_batch_source, default_journal_path, format_summary
+except ImportError:
+    from batch import BatchJournal, BatchRunner, load_batch_source, default_journal_path, format_summary
+
+try:
+    from .job_engine import JobEngine, JobCancelled, JOB_QUEUED
+except ImportError:
+    from job_engine import JobEngine, JobCancelled, JOB_QUEUED
+
+try:
+    from .job_journal import JobJournal
+except ImportError:
+    from job_journal import JobJournal
+
+try:
+    from . import tracing
+except ImportError:
+    import tracing
 
 logger = logging.getLogger(__name__)
 
-def get_next_available_filename(directory, file_extension="mp4"):
-    i = 1
-    while True:
-        filename = f"{i}.{file_extension}"
-        filepath = os.path.join(directory, filename)
-        if not os.path.exists(filepath): return filepath
-        i += 1
+@tracing.traced("get_next_available_filename")
+def get_next_available_filename(directory, file_extension="mp4", template=None, **fields):
+    """Reserves and returns the next output path in directory (see OutputNamer for templates and fields)."""
+    return OutputNamer(directory, template or f"{{n}}.{file_extension}").allocate(**fields)
 
 def parse_flexible_time(time_str):
     if not time_str: return None
@@ -64,26 +86,172 @@ def parse_flexible_time(time_str):
     if hours > 99: logger.warning(f"Hours > 99: {hours}"); return None
     return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
 
+def parse_segments(range_strs):
+    """Parses "<start>-<end>" tokens into a list of (start, end) HH:MM:SS pairs.
+
+    Returns (segments, error_message); there must be at least one segment, in order and not overlapping.
+    """
+    if not range_strs:
+        return None, "No cut ranges given. Use <start>-<end>, e.g. 1m-1m30s."
+    segments = []
+    for range_str in range_strs:
+        if range_str.count("-") != 1:
+            return None, f"Invalid range '{range_str}'. Use <start>-<end>, e.g. 1m-1m30s."
+        start_str, end_str = range_str.split("-")
+        start_time, end_time = parse_flexible_time(start_str), parse_flexible_time(end_str)
+        if start_time is None or end_time is None:
+            return None, f"Invalid time in range '{range_str}'. Use format like 1h2m3s, 10m, 30s, or HH:MM:SS."
+        if time_to_seconds(end_time) <= time_to_seconds(start_time):
+            return None, f"Range '{range_str}' ends before it starts."
+        if segments and time_to_seconds(start_time) < time_to_seconds(segments[-1][1]):
+            return None, f"Range '{range_str}' overlaps or comes before the previous range. List ranges in order."
+        segments.append((start_time, end_time))
+    return segments, None
+
 class YouTubeVideoCutterExtension(Extension):
     def __init__(self):
         super(YouTubeVideoCutterExtension, self).__init__()
+        self.job_engine = None
+        self.source_cache = None
+        self.notifier = None
+        self.metadata_probe = None
+        self.job_journal = None
+        self.item_enter_listener = ItemEnterEventListener()
         self.subscribe(KeywordQueryEvent, KeywordQueryEventListener())
-        self.subscribe(ItemEnterEvent, ItemEnterEventListener()) 
+        self.subscribe(ItemEnterEvent, self.item_enter_listener) 
+        self.subscribe(PreferencesEvent, PreferencesEventListener())
+        self.subscribe(PreferencesUpdateEvent, PreferencesUpdateEventListener())
+
+    def get_job_engine(self):
+        """Creates the job engine on first use, once preferences are available."""
+        if self.job_engine is None:
+            self.job_engine = JobEngine(lambda job: self.item_enter_listener.run_job(job, self),
+                                        max_downloads=self._int_preference('ytc_max_concurrent_downloads', 2),
+                                        max_ffmpeg=self._int_preference('ytc_max_concurrent_cuts', 1),
+                                        journal=self.get_job_journal())
+        return self.job_engine
+
+    def get_job_journal(self):
+        """Returns the journal that lets jobs survive a restart, or None if it can't be opened."""
+        if self.job_journal is None:
+            journal_dir = self.preferences.get('ytc_cache_dir', '~/.cache/ytc-video-cutter')
+            try:
+                self.job_journal = JobJournal(journal_dir)
+            except OSError as e:
+                logger.error(f"Could not open job journal in {journal_dir}: {e}")
+                return None
+        return self.job_journal
 
-    def show_notification(self, title, text, notification_type="info"):
+    def configure_tracing(self):
+        """Starts writing per-phase timing spans to the trace file preference (empty = off)."""
+        trace_file = self.preferences.get('ytc_trace_file', "").strip()
         try:
-            subprocess.run(['notify-send', '-a', 'YouTube Video Cutter', '-i', 'video-x-generic', title, text], check=False) 
+            tracing.configure(trace_file)
+        except OSError as e:
+            logger.error(f"Could not open trace file {trace_file}: {e}")
+
+    def resume_unfinished_jobs(self):
+        """Requeues the jobs a previous run of the extension didn't finish."""
+        journal = self.get_job_journal()
+        recovered = journal.take_recovered() if journal else []
+        if not recovered:
+            return
+        jobs = self.get_job_engine().resume(recovered)
+        self.show_notification("Resuming Jobs", f"Resuming {len(jobs)} unfinished job(s): " + "; ".join(job.describe() for job in jobs))
+
+    def get_source_cache(self):
+        """Returns the source media cache, or None when it is disabled (size limit 0)."""
+        if self.source_cache is None:
+            max_mb = self._int_preference('ytc_cache_max_mb', 2048)
+            if max_mb <= 0:
+                return None
+            cache_dir = self.preferences.get('ytc_cache_dir', '~/.cache/ytc-video-cutter')
+            try:
+                self.source_cache = SourceCache(cache_dir, max_mb * 1024 * 1024)
+            except OSError as e:
+                logger.error(f"Could not open source cache in {cache_dir}: {e}")
+                return None
+        return self.source_cache
+
+    def get_metadata_probe(self):
+        """Returns the metadata probe used to validate queries, or None when lookups are disabled."""
+        if self.preferences.get('ytc_metadata_lookup', "true") != "true":
+            return None
+        if self.metadata_probe is None:
+            cache_dir = os.path.join(os.path.expanduser(self.preferences.get('ytc_cache_dir', '~/.cache/ytc-video-cutter')), "metadata")
+            try:
+                self.metadata_probe = MetadataProbe(cache_dir)
+            except OSError as e:
+                logger.error(f"Could not open metadata cache in {cache_dir}: {e}")
+                return None
+        return self.metadata_probe
+
+    def _int_preference(self, key, default):
+        value = self.preferences.get(key, str(default))
+        try:
+            return int(value)
+        except ValueError:
+            logger.warning(f"Invalid value for preference {key}: '{value}'. Defaulting to {default}.")
+            return default
+
+    def show_notification(self, title, text, notification_type="info", job_id=None, coalesce=False):
+        """Shows a desktop notification. Notifications of the same job_id update a single popup;
+        coalesce=True rate limits the update (used for progress)."""
+        try:
+            if self.notifier is None:
+                self.notifier = Notifier()
+            self.notifier.notify(title, text, key=job_id, coalesce=coalesce)
         except Exception as e:
             logger.warning(f"Could not show notification: {e}")
 
+class PreferencesEventListener(EventListener):
+    """Stores the preferences sent on startup, sets up tracing, then resumes jobs left unfinished by the last run."""
+
+    def on_event(self, event, extension):
+        extension.preferences.update(event.preferences)
+        extension.configure_tracing()
+        extension.resume_unfinished_jobs()
+
+class PreferencesUpdateEventListener(EventListener):
+    """Stores a preference changed in Ulauncher's settings; a new trace file takes effect right away."""
+
+    def on_event(self, event, extension):
+        extension.preferences[event.id] = event.new_value
+        if event.id == 'ytc_trace_file':
+            extension.configure_tracing()
+
 class KeywordQueryEventListener(EventListener):
     def on_event(self, event, extension):
         query = event.get_argument() or ""
         if not query:
-            return RenderResultListAction([ExtensionResultItem(icon='images/icon.png', name='Usage: <url> <start> <end> OR <url> full', description='Time: 1m30s, 2h, 45s. Ex: ... 1m30s 2m15s OR ... full', on_enter=DoNothingAction())])
+            return RenderResultListAction([ExtensionResultItem(icon='images/icon.png', name='Usage: <url> <start> <end> OR <url> <start>-<end> ... [concat] OR <url> full OR batch <manifest|playlist>', description='Time: 1m30s, 2h, 45s. Ex: ... 1m30s 2m15s OR ... 1m-1m30s 5m-6m concat OR ... full', on_enter=DoNothingAction())] + self._job_items(extension))
+        if query.strip().lower() == 'jobs':
+            return RenderResultListAction(self._job_items(extension) or [ExtensionResultItem(icon='images/icon.png', name='No active jobs', description='Queued and running cuts/downloads are listed here.', on_enter=DoNothingAction())])
+        if query.strip().lower() == 'cache':
+            cache = extension.get_source_cache()
+            if cache is None:
+                return RenderResultListAction([ExtensionResultItem(icon='images/icon.png', name='Source cache is disabled', description='Set a cache size limit above 0 in the preferences to enable it.', on_enter=DoNothingAction())])
+            stats = cache.stats()
+            return RenderResultListAction([ExtensionResultItem(icon='images/icon.png', name=f"Source cache: {stats['entries']} videos, {stats['bytes'] / (1024 * 1024):.1f} MB", description=f"Hits: {stats['hits']}, misses: {stats['misses']}, evicted: {stats['evicted_bytes'] / (1024 * 1024):.1f} MB", on_enter=DoNothingAction())])
+        if query.strip().lower().split()[:1] == ['batch']:
+            return RenderResultListAction([self._batch_item(query.strip()[len('batch'):].strip())])
         parts = query.split()
         action_data, item_name, item_description = {}, "", ""
-        if len(parts) == 3: 
+        # Ranges are checked first, so "<url> 1m-2m 5m-6m" isn't taken for a <url> <start> <end> cut.
+        if len(parts) >= 2 and ("-" in parts[1] or parts[-1].lower() == 'concat'):
+            video_url, range_strs = parts[0], parts[1:]
+            concat = range_strs[-1].lower() == 'concat'
+            if concat: range_strs = range_strs[:-1]
+            if not (video_url.startswith("http://") or video_url.startswith("https://")): return RenderResultListAction([ExtensionResultItem(icon='images/icon.png', name='Invalid URL Format', description='Please enter a valid video URL.', highlightable=False, on_enter=HideWindowAction())])
+            segments, error = parse_segments(range_strs)
+            if error: return RenderResultListAction([ExtensionResultItem(icon='images/icon.png', name='Invalid Cut Ranges', description=error, highlightable=False, on_enter=HideWindowAction())])
+            if len(segments) == 1 and not concat:
+                action_data = {'action_type': 'cut', 'url': video_url, 'start': segments[0][0], 'end': segments[0][1]}; item_name = f"Cut Video: {video_url}"; item_description = f"Start: {segments[0][0]}, End: {segments[0][1]}"
+            else:
+                action_data = {'action_type': 'multi_cut', 'url': video_url, 'segments': segments, 'concat': concat, 'start': segments[0][0], 'end': segments[-1][1]}
+                item_name = f"Cut {len(segments)} Clips: {video_url}"
+                item_description = ", ".join(f"{start}-{end}" for start, end in segments) + (" (joined into one file)" if concat else "")
+        elif len(parts) == 3: 
             video_url, start_time_str, end_time_str = parts
             start_time, end_time = parse_flexible_time(start_time_str), parse_flexible_time(end_time_str)
             if start_time is None or end_time is None: return RenderResultListAction([ExtensionResultItem(icon='images/icon.png', name='Invalid Time Format for Cut', description='Use format like 1h2m3s, 10m, 30s, or HH:MM:SS.', highlightable=False, on_enter=HideWindowAction())])
@@ -92,17 +260,79 @@ class KeywordQueryEventListener(EventListener):
         elif len(parts) == 2 and parts[1].lower() == 'full': 
             video_url = parts[0]
             if not (video_url.startswith("http://") or video_url.startswith("https://")): return RenderResultListAction([ExtensionResultItem(icon='images/icon.png', name='Invalid URL Format', description='Please enter a valid video URL.', highlightable=False, on_enter=HideWindowAction())])
-            action_data = {'action_type': 'full_download', 'url': video_url}; item_name = f"Download Full Video: {video_url}"; item_description = "Download the entire video. Filename will be sequential (e.g., 1.mp4)."
-        else: return RenderResultListAction([ExtensionResultItem(icon='images/icon.png', name='Invalid Input Format', description='Use: <url> <start> <end> OR <url> full', highlightable=False, on_enter=HideWindowAction())])
+            action_data = {'action_type': 'full_download', 'url': video_url}; item_name = f"Download Full Video: {video_url}"; item_description = "Download the entire video. Named by the output filename template (default: sequential, e.g. 1.mp4)."
+        else: return RenderResultListAction([ExtensionResultItem(icon='images/icon.png', name='Invalid Input Format', description='Use: <url> <start> <end> OR <url> <start>-<end> ... [concat] OR <url> full', highlightable=False, on_enter=HideWindowAction())])
+        item_name, item_description, error = self._with_metadata(extension, action_data, item_name, item_description)
+        if error: return RenderResultListAction([ExtensionResultItem(icon='images/icon.png', name='Cannot Process Video', description=error, highlightable=False, on_enter=HideWindowAction())])
         return RenderResultListAction([ExtensionResultItem(icon='images/icon.png', name=item_name, description=item_description, on_enter=ExtensionCustomAction(action_data, keep_app_open=False))])
 
-class ItemEnterEventListener(EventListener):
-    def __init__(self):
-        super(ItemEnterEventListener, self).__init__()
-        self.last_notification_time = 0
-        self.last_reported_percentage_str = "" # Store the string to avoid re-notifying same string
+    def _with_metadata(self, extension, action_data, item_name, item_description):
+        """Adds the video title, clip length and estimated download size from cached metadata.
+
+        Never waits for the network: without cached metadata a debounced lookup is started and the
+        item is shown as is. Returns (item_name, item_description, error); error is set when the
+        URL is known to be dead or the end time is past the end of the video.
+        """
+        probe = extension.get_metadata_probe()
+        if probe is None:
+            return item_name, item_description, None
+        video_url = action_data['url']
+        record = probe.get(video_url)
+        if record is None:
+            probe.request(video_url)
+            return item_name, f"{item_description} (looking up video...)", None
+        if 'error' in record:
+            return item_name, item_description, f"Video unavailable: {record['error']}"
 
-    def _progress_callback(self, extension, percentage_str, operation_name="Download"):
+        metadata = record['metadata']
+        duration = metadata.get('duration')
+        if duration and action_data.get('end') and time_to_seconds(action_data['end']) > duration:
+            return item_name, item_description, f"End time {action_data['end']} is past the end of the video ({seconds_to_time(duration)})."
+        if metadata.get('title'):
+            action_data['title'] = metadata['title']
+            item_name = item_name.replace(video_url, metadata['title'])
+
+        if action_data['action_type'] == 'full_download':
+            clip_seconds, estimate = duration, estimate_range_bytes(metadata)
+        else:
+            segments = action_data.get('segments') or [(action_data['start'], action_data['end'])]
+            clip_seconds = sum(time_to_seconds(end) - time_to_seconds(start) for start, end in segments)
+            padding = extension._int_preference('ytc_keyframe_padding', 10) if extension.preferences.get('ytc_section_download', "true") == "true" else 0
+            estimate = estimate_range_bytes(metadata, action_data['start'], action_data['end'], padding)
+        details = []
+        if clip_seconds:
+            details.append(f"Length: {seconds_to_time(clip_seconds)}")
+        if estimate:
+            details.append(f"Download: ~{estimate / (1024 * 1024):.1f} MB")
+        if details:
+            item_description = f"{item_description} | {', '.join(details)}"
+        return item_name, item_description, None
+
+    def _batch_item(self, source):
+        """Result item for "batch <manifest path or playlist URL>"."""
+        if not source:
+            return ExtensionResultItem(icon='images/icon.png', name='Usage: batch <manifest.csv|manifest.jsonl|playlist URL>', description='Manifest rows: url,start,end (leave start/end empty for the whole video). Finished rows are skipped when rerun.', on_enter=DoNothingAction())
+        if not source.startswith(("http://", "https://")) and not os.path.isfile(os.path.expanduser(source)):
+            return ExtensionResultItem(icon='images/icon.png', name='Manifest Not Found', description=f"No such file: {source}", highlightable=False, on_enter=HideWindowAction())
+        description = "Download every video of the playlist." if source.startswith(("http://", "https://")) else "Cut/download every row of the manifest."
+        return ExtensionResultItem(icon='images/icon.png', name=f"Run Batch: {source}", description=f"{description} Resumes where an interrupted run stopped.", on_enter=ExtensionCustomAction({'action_type': 'batch', 'source': source}, keep_app_open=False))
+
+    def _job_items(self, extension):
+        """Result items for active jobs; selecting one cancels it."""
+        if extension.job_engine is None:
+            return []
+        items = []
+        for job in extension.job_engine.list_jobs():
+            status = "Queued" if job.state == JOB_QUEUED else (f"{job.phase} {job.progress}".strip() or "Running")
+            items.append(ExtensionResultItem(icon='images/icon.png', name=f"[{status}] {job.describe()}", description=f"Job {job.id}. Press Enter to cancel.", on_enter=ExtensionCustomAction({'action_type': 'cancel_job', 'job_id': job.id}, keep_app_open=False)))
+        return items
+
+class ItemEnterEventListener(EventListener):
+    @tracing.traced("progress_callback")
+    def _progress_callback(self, extension, job, progress, operation_name="Download"):
+        # progress is a ProgressEvent from video_cutter_lib (plain percentage strings from the fallback functions also work)
+        progress_text = str(progress).strip()
+        job.progress = progress_text
         try:
             notify_interval_str = extension.preferences.get('ytc_progress_notify_interval', "5")
             try:
@@ -112,107 +342,355 @@ class ItemEnterEventListener(EventListener):
                 notify_interval = 5
 
             current_time = time.time()
-            is_final = "100" in percentage_str # A bit simplistic, but good for final update
+            percent = getattr(progress, 'percent', None)
+            percentage_str = getattr(progress, 'percent_str', progress_text)
+            is_final = percent >= 100 if percent is not None else "100" in percentage_str
 
-            # Avoid sending the exact same percentage string repeatedly if yt-dlp sends it multiple times
-            if percentage_str == self.last_reported_percentage_str and not is_final:
+            # Avoid sending the same percentage repeatedly; yt-dlp and ffmpeg report far more often than it changes
+            if percentage_str == job.last_reported_percentage_str and not is_final:
                 return
 
-            if is_final or notify_interval == 0 or (current_time - self.last_notification_time >= notify_interval) :
-                extension.show_notification(f"{operation_name} Progress", f"{percentage_str.strip()}")
-                self.last_notification_time = current_time
-                self.last_reported_percentage_str = percentage_str
+            if is_final or notify_interval == 0 or (current_time - job.last_notification_time >= notify_interval) :
+                extension.show_notification(f"{operation_name} Progress", progress_text, job_id=job.id, coalesce=not is_final)
+                job.last_notification_time = current_time
+                job.last_reported_percentage_str = percentage_str
             
             if is_final: # Reset for next operation
-                self.last_notification_time = 0
-                self.last_reported_percentage_str = ""
+                job.last_notification_time = 0
+                job.last_reported_percentage_str = ""
 
 
-        except Exception as e: # Catch any error within callback to prevent crashing the main thread
+        except Exception as e: # Catch any error within callback to prevent crashing the worker thread
             logger.error(f"Error in progress_callback: {e}", exc_info=True)
             # Show it anyway if an error occurs, but don't update time to allow next one sooner
-            extension.show_notification(f"{operation_name} Progress", f"{percentage_str.strip()} (callback error)")
+            extension.show_notification(f"{operation_name} Progress", f"{progress_text} (callback error)", job_id=job.id)
 
 
     def on_event(self, event, extension):
-        self.last_notification_time = 0 # Reset for each new operation
-        self.last_reported_percentage_str = ""
-
         data = event.get_data()
         action_type = data.get('action_type')
-        video_url = data['url']
+
+        if action_type == 'cancel_job':
+            if extension.get_job_engine().cancel(data['job_id']):
+                extension.show_notification("Job Cancelled", f"Job {data['job_id']} was cancelled.", job_id=data['job_id'])
+            return HideWindowAction()
+
+        if action_type not in ('cut', 'multi_cut', 'full_download', 'batch'):
+            logger.error(f"Unknown action type: {action_type}")
+            extension.show_notification("Error", "Unknown action requested.")
+            return HideWindowAction()
+
+        # Cuts are usually short and interactive, so they go ahead of queued full downloads.
+        job = extension.get_job_engine().submit(action_type, data, priority=1 if action_type in ('full_download', 'batch') else 0)
+        active_jobs = len(extension.job_engine.list_jobs())
+        if active_jobs > 1:
+            extension.show_notification("Job Queued", f"Job {job.id} queued ({active_jobs} active jobs).", job_id=job.id)
+        return HideWindowAction()
+
+    def _fetch_source(self, job, extension, work_dir):
+        """Gets the source for a cut job. Returns (source_path, cut_start, cut_end) with cut times relative to the source."""
+        return self._checkpointed_source(job, extension) or self._cached_source(job, extension) or self._download_source(job, extension, work_dir)
+
+    def _checkpointed_source(self, job, extension):
+        """The source a resumed job already downloaded before the restart, as (source_path, cut_start, cut_end), or None."""
+        artifacts = job.checkpoint.get('artifacts', {})
+        if job.checkpoint.get('phase') not in ('downloaded', 'cutting') or not artifacts.get('source'):
+            return None
+        cache = extension.get_source_cache()
+        if cache:
+            cache.pin(artifacts['source'], job.key) # No-op unless the source is a cache entry
+        if not os.path.exists(artifacts['source']):
+            return None
+        logger.info(f"Resuming job {job.id} with the source downloaded before the restart: {artifacts['source']}")
+        return artifacts['source'], artifacts['cut_start'], artifacts['cut_end']
+
+    @contextmanager
+    def _work_dir(self, job, extension):
+        """Yields the job's work directory: the journal's stable one (so partial downloads survive a restart), else a temporary one."""
+        journal = extension.get_job_journal()
+        if journal is not None:
+            yield journal.work_dir(job.key) # Removed by the job engine once the job finishes
+        else:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                yield tmpdir
+
+    def _cached_source(self, job, extension):
+        """Looks the cut job's range up in the source cache. Returns (source_path, cut_start, cut_end) or None."""
+        cache = extension.get_source_cache()
+        if not cache:
+            return None
+        cached = cache.lookup(job.data['url'], job.data['start'], job.data['end'], owner=job.key) # Released when run_job finishes
+        if not cached:
+            return None
+        logger.info(f"Source cache hit for {job.data['url']}: {cached['path']}")
+        return cached['path'], cached['start'], cached['end']
+
+    def _download_source(self, job, extension, work_dir):
+        """Downloads the source for a cut job (into the source cache when enabled). Returns (source_path, cut_start, cut_end)."""
+        data = job.data
+        video_url, start_time, end_time = data['url'], data['start'], data['end']
+        cache = extension.get_source_cache()
+        # A stable name in the work directory lets yt-dlp continue its .part file after a restart.
+        temp_video_path = os.path.join(work_dir, "downloaded_video.mp4")
+        job.save_checkpoint('downloading', source_download=temp_video_path)
+        logger.info(f"Temporary video file for cutting: {temp_video_path}")
+
+        section = None
+        try:
+            with extension.get_job_engine().download_slot(job):
+                if extension.preferences.get('ytc_section_download', "true") == "true":
+                    try:
+                        section = download_section(video_url, start_time, end_time, temp_video_path,
+                                                   lambda p: self._progress_callback(extension, job, p, "Download (for cut)"),
+                                                   keyframe_padding=extension._int_preference('ytc_keyframe_padding', 10),
+                                                   process_callback=job.attach_process)
+                    except subprocess.CalledProcessError as e:
+                        job.check_cancelled()
+                        logger.warning(f"Section download failed, falling back to full download: {e}")
+                        if os.path.exists(temp_video_path):
+                            os.remove(temp_video_path)
+
+                if section:
+                    logger.info(f"Section download for cut complete: {section['bytes_fetched']} bytes fetched (full size: {section['full_size']}).")
+                else:
+                    download_video(video_url, temp_video_path, 
+                                   lambda p: self._progress_callback(extension, job, p, "Download (for cut)"),
+                                   process_callback=job.attach_process) 
+                    logger.info("Video download for cut complete.")
+        except BaseException:
+            if cache and os.path.exists(temp_video_path):
+                os.remove(temp_video_path)
+            raise
+
+        if section:
+            source_path = cache.insert(video_url, temp_video_path, section['offset'], section['offset_end'], owner=job.key) if cache else temp_video_path
+            source = (source_path, section['start'], section['end'])
+        else:
+            source_path = cache.insert(video_url, temp_video_path, owner=job.key) if cache else temp_video_path
+            source = (source_path, start_time, end_time)
+        job.save_checkpoint('downloaded', source=source[0], cut_start=source[1], cut_end=source[2])
+        return source
+
+    def _allocate_output_path(self, extension, output_directory, data, start_time=None, end_time=None):
+        """Reserves an output path named by the filename template preference."""
+        return get_next_available_filename(output_directory, "mp4",
+                                           extension.preferences.get('ytc_filename_template', "{n}.mp4"),
+                                           title=data.get('title'), video_id=normalize_video_id(data['url']),
+                                           start=start_time, end=end_time)
+
+    def run_batch_job(self, job, extension, output_directory):
+        """Runs a batch job: every manifest/playlist row through a BatchRunner. Returns the summary."""
+        engine = extension.get_job_engine()
+        source = job.data['source']
+        extension.show_notification("Batch Started", f"Reading {source}", job_id=job.id)
+        job.phase = "reading batch"
+        rows = load_batch_source(source, process_callback=job.attach_process)
+        job.check_cancelled()
+        cache_dir = extension.preferences.get('ytc_cache_dir', '~/.cache/ytc-video-cutter')
+        journal = BatchJournal(default_journal_path(source, os.path.join(os.path.expanduser(cache_dir), "batches")))
+
+        def row_finished(summary):
+            finished = summary['done'] + summary['skipped'] + summary['failed']
+            job.progress = f"{finished}/{summary['rows']} rows"
+            extension.show_notification("Batch Progress", f"{finished}/{summary['rows']} rows finished, {summary['failed']} failed",
+                                        job_id=job.id, coalesce=finished < summary['rows'])
+
+        runner = BatchRunner(output_directory, journal, workers=extension._int_preference('ytc_batch_workers', 2),
+                             template=extension.preferences.get('ytc_filename_template', "{n}.mp4"),
+                             process_callback=job.attach_process, download_slot=lambda: engine.download_slot(job),
+                             ffmpeg_slot=lambda: engine.ffmpeg_slot(job), should_stop=lambda: job.cancelled,
+                             on_row_finished=row_finished)
+        job.phase = "batch"
+        summary = runner.run(rows)
+        job.check_cancelled()
+        logger.info(f"Batch {source} finished: {format_summary(summary)}")
+        extension.show_notification("Batch Complete" if not summary['failed'] else "Batch Finished With Errors", format_summary(summary), job_id=job.id)
+        return summary
+
+    def run_job(self, job, extension):
+        """Runs a queued job on a job engine worker thread. Returns the output path on success."""
+        data = job.data
+        action_type = job.action_type
+        video_url = data.get('url')
+        engine = extension.get_job_engine()
         
         output_directory = os.path.expanduser(extension.preferences.get('ytc_output_dir', '~/Downloads'))
         if not os.path.exists(output_directory):
             try:
-                os.makedirs(output_directory)
+                os.makedirs(output_directory, exist_ok=True)
                 logger.info(f"Output directory created: {output_directory}")
             except OSError as e:
                 logger.error(f"Could not create output directory: {output_directory}. Error: {e}")
-                extension.show_notification("Error", f"Could not create output directory: {e}")
-                return HideWindowAction()
+                extension.show_notification("Error", f"Could not create output directory: {e}", job_id=job.id)
+                raise
+
+        if action_type == 'batch':
+            try:
+                return self.run_batch_job(job, extension, output_directory)
+            except JobCancelled:
+                raise
+            except Exception as e:
+                job.check_cancelled()
+                logger.error(f"Batch {data['source']} failed: {e}", exc_info=True)
+                extension.show_notification("Batch Error", f"Batch {data['source']} failed: {e}", job_id=job.id)
+                raise
+            finally:
+                if extension.notifier is not None:
+                    extension.notifier.forget(job.id)
         
-        final_output_path = get_next_available_filename(output_directory, "mp4")
+        final_output_path = job.checkpoint.get('artifacts', {}).get('output')
+        if final_output_path and os.path.exists(final_output_path):
+            # Still reserved by this job; a clip cut off by the restart is overwritten, like multi-cut clips.
+            logger.info(f"Resuming job {job.id} into its reserved output {final_output_path}")
+        else:
+            final_output_path = self._allocate_output_path(extension, output_directory, data, data.get('start'), data.get('end'))
+            job.save_checkpoint(job.checkpoint.get('phase', 'started'), output=final_output_path)
+        # Smart cuts are frame accurate; plain cuts stream-copy and snap to keyframes.
+        smart_cut = extension.preferences.get('ytc_cut_mode', "copy") == "smart"
 
         try:
             if action_type == 'cut':
                 start_time = data['start']
                 end_time = data['end']
                 
-                extension.show_notification("Processing Started", f"Downloading and cutting video: {video_url}")
-                with tempfile.TemporaryDirectory() as tmpdir:
-                    temp_video_path = os.path.join(tmpdir, "downloaded_video.mp4")
-                    
-                    logger.info(f"Temporary video file for cutting: {temp_video_path}")
-                    
-                    download_video(video_url, temp_video_path, 
-                                   lambda p: self._progress_callback(extension, p, "Download (for cut)")) 
-                    
-                    logger.info("Video download for cut complete.")
-                    # Notification for "Download Successful" is now handled by 100% progress or final callback state
+                extension.show_notification("Processing Started", f"Downloading and cutting video: {video_url}", job_id=job.id)
+                source = self._checkpointed_source(job, extension) or self._cached_source(job, extension)
+                if source is None and not smart_cut and extension.preferences.get('ytc_stream_cut', "false") == "true":
+                    # Streaming cuts straight from the download; nothing but the clip touches the disk.
+                    with engine.download_slot(job), engine.ffmpeg_slot(job):
+                        metrics = stream_cut_video(video_url, start_time, end_time, final_output_path,
+                                                   lambda p: self._progress_callback(extension, job, p, "Stream Cut"),
+                                                   process_callback=job.attach_process)
+                    logger.info(f"Stream cut complete: {metrics['bytes_read']} bytes read, peak disk usage {metrics['peak_disk_bytes']} bytes.")
+                    extension.show_notification("Processing Complete", f"Cut video saved: {final_output_path}", job_id=job.id)
+                else:
+                    with self._work_dir(job, extension) as work_dir:
+                        source_path, cut_start, cut_end = source or self._download_source(job, extension, work_dir)
+                        # Notification for "Download Successful" is now handled by 100% progress or final callback state
 
-                    logger.info(f"Cutting video: {start_time} - {end_time} to {final_output_path}")
-                    extension.show_notification("Cutting", "Cutting video...")
-                    cut_video(temp_video_path, start_time, end_time, final_output_path)
-                    logger.info("Video cutting complete.")
-                    extension.show_notification("Processing Complete", f"Cut video saved: {final_output_path}")
+                        with engine.ffmpeg_slot(job):
+                            logger.info(f"Cutting video: {start_time} - {end_time} to {final_output_path}")
+                            extension.show_notification("Cutting", "Cutting video...", job_id=job.id)
+                            if smart_cut:
+                                smart_cut_video(source_path, cut_start, cut_end, final_output_path, process_callback=job.attach_process)
+                            else:
+                                cut_video(source_path, cut_start, cut_end, final_output_path, process_callback=job.attach_process,
+                                          progress_callback=lambda p: self._progress_callback(extension, job, p, "Cutting"))
+                        logger.info("Video cutting complete.")
+                        extension.show_notification("Processing Complete", f"Cut video saved: {final_output_path}", job_id=job.id)
+
+            elif action_type == 'multi_cut':
+                segments = data['segments']
+                extension.show_notification("Processing Started", f"Downloading and cutting {len(segments)} clips: {video_url}", job_id=job.id)
+                with self._work_dir(job, extension) as work_dir:
+                    # One fetch covers every segment; shift the segments by where the fetched source starts.
+                    source_path, span_start, _ = self._fetch_source(job, extension, work_dir)
+                    offset = time_to_seconds(data['start']) - time_to_seconds(span_start)
+                    relative_segments = [(seconds_to_time(time_to_seconds(start) - offset), seconds_to_time(time_to_seconds(end) - offset)) for start, end in segments]
+                    if data.get('concat'):
+                        clip_paths = [os.path.join(work_dir, f"clip_{i + 1}.mp4") for i in range(len(segments))]
+                    else:
+                        OutputNamer.release(final_output_path)
+                        clip_paths = job.checkpoint.get('artifacts', {}).get('clips') or []
+                        if len(clip_paths) != len(segments) or not all(os.path.exists(p) for p in clip_paths):
+                            clip_paths = [self._allocate_output_path(extension, output_directory, data, start, end) for start, end in segments]
+                    job.save_checkpoint('cutting', clips=clip_paths)
+
+                    with engine.ffmpeg_slot(job):
+                        extension.show_notification("Cutting", f"Cutting {len(segments)} clips...", job_id=job.id)
+                        try:
+                            if smart_cut:
+                                for (clip_start, clip_end), clip_path in zip(relative_segments, clip_paths):
+                                    smart_cut_video(source_path, clip_start, clip_end, clip_path, process_callback=job.attach_process)
+                            else:
+                                cut_segments(source_path, relative_segments, clip_paths, process_callback=job.attach_process)
+                            if data.get('concat'):
+                                concat_videos(clip_paths, final_output_path, process_callback=job.attach_process)
+                        except BaseException:
+                            for clip_path in clip_paths:
+                                OutputNamer.release(clip_path)
+                            raise
+                    logger.info("Multi-segment cutting complete.")
+                    if data.get('concat'):
+                        extension.show_notification("Processing Complete", f"Compilation of {len(segments)} clips saved: {final_output_path}", job_id=job.id)
+                    else:
+                        extension.show_notification("Processing Complete", f"{len(segments)} clips saved: {', '.join(os.path.basename(p) for p in clip_paths)}", job_id=job.id)
 
             elif action_type == 'full_download':
-                extension.show_notification("Processing Started", f"Downloading full video: {video_url}")
+                extension.show_notification("Processing Started", f"Downloading full video: {video_url}", job_id=job.id)
                 
-                confirmed_download_path = download_full_video(video_url, final_output_path,
-                                                              lambda p: self._progress_callback(extension, p, "Full Download"))
+                connections = extension._int_preference('ytc_download_connections', 4)
+                full_progress = lambda p: self._progress_callback(extension, job, p, "Full Download")
+                with self._work_dir(job, extension) as work_dir, engine.download_slot(job):
+                    # Downloaded in the work directory under a stable name, so a restart continues the partial download.
+                    download_path = os.path.join(work_dir, "full_video.mp4")
+                    job.save_checkpoint('downloading', full_download=download_path)
+                    if connections > 1:
+                        try:
+                            confirmed_download_path = download_full_video_parallel(video_url, download_path, connections, full_progress,
+                                                                                   process_callback=job.attach_process, resume=True)
+                        except OSError as e:
+                            job.check_cancelled()
+                            logger.warning(f"Parallel download failed ({e}), retrying with a single connection.")
+                            confirmed_download_path = download_full_video(video_url, download_path, full_progress,
+                                                                          process_callback=job.attach_process, resume=True)
+                    else:
+                        confirmed_download_path = download_full_video(video_url, download_path, full_progress,
+                                                                      process_callback=job.attach_process, resume=True)
+                    if confirmed_download_path and os.path.exists(confirmed_download_path):
+                        # Keep the reserved name, but with the extension yt-dlp actually produced
+                        target_path = os.path.splitext(final_output_path)[0] + os.path.splitext(confirmed_download_path)[1]
+                        shutil.move(confirmed_download_path, target_path)
+                        if target_path != final_output_path:
+                            OutputNamer.release(final_output_path)
+                        confirmed_download_path = target_path
                 
                 # Notification for "Download Complete" is now handled by 100% progress or final callback state
                 if confirmed_download_path and os.path.exists(confirmed_download_path):
                     logger.info(f"Full video download complete: {confirmed_download_path}")
+                    final_output_path = confirmed_download_path
                     # No separate "Download Complete" notification here if 100% progress already sent it
                 else:
                     logger.error(f"Full video download attempted to {final_output_path}, but path confirmation failed or file not found. Confirmed path: {confirmed_download_path}")
-                    extension.show_notification("Download Issue", f"Full video download to {final_output_path} may have failed. Please check the directory.")
+                    extension.show_notification("Download Issue", f"Full video download to {final_output_path} may have failed. Please check the directory.", job_id=job.id)
 
-            else:
-                logger.error(f"Unknown action type: {action_type}")
-                extension.show_notification("Error", "Unknown action requested.")
-                return HideWindowAction()
-
-            auto_open_pref = extension.preferences.get('ytc_auto_open_dir', "true")
-            if auto_open_pref == "true": # Compare with string "true"
-                logger.info(f"Auto-opening output directory: {output_directory}")
-                return OpenAction(output_directory)
-                
+        except JobCancelled:
+            raise
         except subprocess.CalledProcessError as e:
+            job.check_cancelled()
             logger.error(f"Error during processing: {e}")
             cmd_str = ' '.join(e.cmd if isinstance(e.cmd, list) else [str(e.cmd)])
             stderr_str = e.stderr[:200] if e.stderr else str(e)
             logger.error(f"Command: {cmd_str}")
             logger.error(f"Stderr: {stderr_str}")
-            extension.show_notification("Error", f"An error occurred: {stderr_str}...")
+            extension.show_notification("Error", f"An error occurred: {stderr_str}...", job_id=job.id)
+            raise
         except Exception as e:
+            job.check_cancelled()
             logger.error(f"An unexpected error occurred: {e}", exc_info=True)
-            extension.show_notification("Critical Error", f"Unexpected error: {str(e)}")
-        
-        return HideWindowAction() 
+            extension.show_notification("Critical Error", f"Unexpected error: {str(e)}", job_id=job.id)
+            raise
+        finally:
+            OutputNamer.release(final_output_path) # Only removes the reservation if nothing was written
+            if extension.source_cache is not None:
+                extension.source_cache.release(job.key) # Unpins the sources this job cut from
+            if extension.notifier is not None:
+                extension.notifier.forget(job.id)
+
+        auto_open_pref = extension.preferences.get('ytc_auto_open_dir', "true")
+        if auto_open_pref == "true": # Compare with string "true"
+            self._open_directory(output_directory)
+        return final_output_path
+
+    def _open_directory(self, directory):
+        """Opens directory in the file manager. Failures are only logged: the job already succeeded."""
+        logger.info(f"Auto-opening output directory: {directory}")
+        try:
+            process = subprocess.Popen(['xdg-open', directory], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except OSError as e:
+            logger.warning(f"Could not open output directory {directory}: {e}")
+            return
+        threading.Thread(target=process.wait, daemon=True).start() # Reaps xdg-open without holding up the worker
 
 if __name__ == '__main__':
     YouTubeVideoCutterExtension().run()
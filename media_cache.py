@@ -0,0 +1,203 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+try:
+    from .video_cutter_lib import normalize_video_id, time_to_seconds, seconds_to_time
+except ImportError:
+    from video_cutter_lib import normalize_video_id, time_to_seconds, seconds_to_time
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "index.json"
+DEFAULT_FORMAT = "default"
+
+class SourceCache:
+    """On-disk LRU cache of downloaded source videos.
+
+    Entries are keyed by the normalized video ID plus the yt-dlp format selection. An entry is
+    either the full source or a downloaded section (see download_section) covering [start, end].
+    Lookups only read index.json, which is rewritten atomically after every change. Files are
+    inserted by renaming a finished download into place, so a crashed download never shows up
+    as a cache entry. Entries returned with an owner (e.g. a job key) stay pinned, so eviction
+    can't delete them, until release(owner) is called.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pins = {} # entry file name -> owners using it
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    @staticmethod
+    def key_for(url, format_selection=DEFAULT_FORMAT):
+        video_id = normalize_video_id(url)
+        digest = hashlib.sha1(f"{video_id}|{format_selection}".encode("utf-8")).hexdigest()[:12]
+        return f"{video_id}-{digest}"
+
+    def temp_path(self, suffix=".mp4"):
+        """Returns a fresh path inside the cache directory to download into before insert()."""
+        fd, path = tempfile.mkstemp(prefix=".incoming-", suffix=suffix, dir=self.cache_dir)
+        os.close(fd)
+        os.remove(path) # yt-dlp refuses to overwrite an existing file; only the unique name is needed
+        return path
+
+    def lookup(self, url, start_time=None, end_time=None, format_selection=DEFAULT_FORMAT, owner=None):
+        """Returns a cached source covering [start_time, end_time], or None on a miss.
+
+        The result holds 'path' and the cut times relative to the cached file ('start'/'end').
+        With an owner, the entry is pinned until release(owner).
+        """
+        key = self.key_for(url, format_selection)
+        start_seconds = time_to_seconds(start_time) if start_time is not None else 0.0
+        end_seconds = time_to_seconds(end_time) if end_time is not None else None
+        with self._lock:
+            best_name, best_entry = None, None
+            for name, entry in list(self._index["entries"].items()):
+                if entry["key"] != key or not self._covers(entry, start_seconds, end_seconds):
+                    continue
+                if not os.path.exists(os.path.join(self.cache_dir, entry["file"])):
+                    logger.warning(f"Cached file {entry['file']} disappeared, dropping it from the index.")
+                    del self._index["entries"][name]
+                    continue
+                if best_entry is None or entry["size"] < best_entry["size"]:
+                    best_name, best_entry = name, entry
+            if best_entry is None:
+                self._index["stats"]["misses"] += 1
+                self._save_index()
+                return None
+            best_entry["last_used"] = time.time()
+            if owner is not None:
+                self._pins.setdefault(best_name, set()).add(owner)
+            self._index["stats"]["hits"] += 1
+            self._save_index()
+        offset = best_entry["start"]
+        return {
+            'path': os.path.join(self.cache_dir, best_entry["file"]),
+            'offset': offset,
+            'start': seconds_to_time(start_seconds - offset) if start_time is not None else None,
+            'end': seconds_to_time(end_seconds - offset) if end_seconds is not None else None,
+        }
+
+    def insert(self, url, source_path, section_start=0.0, section_end=None, format_selection=DEFAULT_FORMAT, owner=None):
+        """Moves a finished download into the cache and returns its new path.
+
+        section_start/section_end describe the part of the video the file holds (None end = full video).
+        With an owner, the new entry is pinned until release(owner).
+        """
+        key = self.key_for(url, format_selection)
+        extension = os.path.splitext(source_path)[1] or ".mp4"
+        if section_end is None:
+            file_name = f"{key}{extension}"
+        else:
+            file_name = f"{key}-{int(section_start * 1000)}-{int(section_end * 1000)}{extension}"
+        final_path = os.path.join(self.cache_dir, file_name)
+        # Files from inside the cache directory (e.g. job work directories) are moved, anything else is copied.
+        if os.path.commonpath([os.path.abspath(source_path), os.path.abspath(self.cache_dir)]) != os.path.abspath(self.cache_dir):
+            staged_path = self.temp_path(extension)
+            shutil.copyfile(source_path, staged_path)
+            source_path = staged_path
+        size = os.path.getsize(source_path)
+        os.replace(source_path, final_path)
+        with self._lock:
+            self._index["entries"][file_name] = {
+                "key": key,
+                "file": file_name,
+                "size": size,
+                "start": float(section_start),
+                "end": float(section_end) if section_end is not None else None,
+                "last_used": time.time(),
+            }
+            if owner is not None:
+                self._pins.setdefault(file_name, set()).add(owner)
+            self._evict(keep=file_name)
+            self._save_index()
+        logger.info(f"Cached source {file_name} ({size} bytes).")
+        return final_path
+
+    def pin(self, path, owner):
+        """Pins the entry stored at path for owner. Returns False if path is no longer cached."""
+        file_name = os.path.basename(path)
+        with self._lock:
+            if file_name not in self._index["entries"] or not os.path.exists(path):
+                return False
+            self._pins.setdefault(file_name, set()).add(owner)
+        return True
+
+    def release(self, owner):
+        """Unpins every entry owner was using, then evicts whatever the pins held back."""
+        with self._lock:
+            for file_name in [name for name, owners in self._pins.items() if owner in owners]:
+                self._pins[file_name].discard(owner)
+                if not self._pins[file_name]:
+                    del self._pins[file_name]
+            if self._evict():
+                self._save_index()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._index["stats"])
+            stats["entries"] = len(self._index["entries"])
+            stats["bytes"] = sum(entry["size"] for entry in self._index["entries"].values())
+        return stats
+
+    @staticmethod
+    def _covers(entry, start_seconds, end_seconds):
+        if entry["end"] is None:
+            return True
+        if end_seconds is None:
+            return False
+        return entry["start"] <= start_seconds and end_seconds <= entry["end"]
+
+    def _evict(self, keep=None):
+        """Removes least recently used entries until the cache fits; pinned entries are skipped. Returns True if any were removed."""
+        entries = self._index["entries"]
+        total = sum(entry["size"] for entry in entries.values())
+        evicted = False
+        for name in sorted(entries, key=lambda n: entries[n]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if name == keep or name in self._pins:
+                continue
+            entry = entries.pop(name)
+            entry_path = os.path.join(self.cache_dir, entry["file"])
+            # Sidecar files (e.g. the keyframe index) are named <entry file>.<suffix>.
+            for path in [entry_path] + glob.glob(glob.escape(entry_path) + ".*"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= entry["size"]
+            evicted = True
+            self._index["stats"]["evicted_bytes"] += entry["size"]
+            logger.info(f"Evicted cached source {entry['file']} ({entry['size']} bytes).")
+        return evicted
+
+    def _load_index(self):
+        index_path = os.path.join(self.cache_dir, INDEX_FILENAME)
+        index = {"entries": {}, "stats": {"hits": 0, "misses": 0, "evicted_bytes": 0}}
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+            index["entries"].update(loaded.get("entries", {}))
+            index["stats"].update(loaded.get("stats", {}))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read cache index {index_path}, starting empty: {e}")
+        return index
+
+    def _save_index(self):
+        index_path = os.path.join(self.cache_dir, INDEX_FILENAME)
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, index_path)
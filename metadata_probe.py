@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+
+try:
+    from .video_cutter_lib import fetch_video_metadata, normalize_video_id
+except ImportError:
+    from video_cutter_lib import fetch_video_metadata, normalize_video_id
+
+logger = logging.getLogger(__name__)
+
+class MetadataProbe:
+    """Debounced background metadata lookups with an in-memory and on-disk TTL cache.
+
+    get() never blocks on the network: it answers from memory (or, once per video, from the
+    small per-video JSON file on disk) and returns None when nothing is cached yet. request()
+    schedules a lookup after `debounce` seconds; a newer request replaces a pending one, so a
+    lookup only starts once the user stops typing. Failed lookups (dead URLs) are cached for
+    error_ttl so the query can report them without probing on every keystroke.
+    """
+
+    def __init__(self, cache_dir, ttl=6 * 3600, error_ttl=300, debounce=0.4):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.debounce = debounce
+        self._lock = threading.Lock()
+        self._memory = {}
+        self._in_flight = set()
+        self._pending_timer = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get(self, url):
+        """Returns the cached record for url ({'metadata': ...} or {'error': ...}), or None."""
+        video_id = normalize_video_id(url)
+        with self._lock:
+            record = self._memory.get(video_id)
+        if record is None:
+            record = self._load(video_id)
+            if record is None:
+                return None
+            with self._lock:
+                self._memory[video_id] = record
+        if record['expires_at'] < time.time():
+            return None
+        return record
+
+    def request(self, url):
+        """Schedules a debounced lookup for url unless a fresh record is cached or a lookup is running."""
+        video_id = normalize_video_id(url)
+        if self.get(url) is not None:
+            return
+        with self._lock:
+            if video_id in self._in_flight:
+                return
+            if self._pending_timer is not None:
+                self._pending_timer.cancel()
+            self._pending_timer = threading.Timer(self.debounce, self._probe, args=(url, video_id))
+            self._pending_timer.daemon = True
+            self._pending_timer.start()
+
+    def _probe(self, url, video_id):
+        with self._lock:
+            if video_id in self._in_flight:
+                return
+            self._in_flight.add(video_id)
+        try:
+            started = time.time()
+            try:
+                record = {'metadata': fetch_video_metadata(url), 'expires_at': time.time() + self.ttl}
+            except subprocess.CalledProcessError as e:
+                error = (e.stderr or "").strip().splitlines()
+                record = {'error': error[-1] if error else str(e), 'expires_at': time.time() + self.error_ttl}
+            except (OSError, ValueError) as e:
+                record = {'error': str(e), 'expires_at': time.time() + self.error_ttl}
+            logger.info(f"Metadata lookup for {video_id} took {time.time() - started:.2f}s")
+            with self._lock:
+                self._memory[video_id] = record
+            self._save(video_id, record)
+        finally:
+            with self._lock:
+                self._in_flight.discard(video_id)
+
+    def _path(self, video_id):
+        return os.path.join(self.cache_dir, f"{video_id}.json")
+
+    def _load(self, video_id):
+        try:
+            with open(self._path(video_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable metadata cache for {video_id}: {e}")
+            return None
+
+    def _save(self, video_id, record):
+        path = self._path(video_id)
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(record, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write metadata cache for {video_id}: {e}")
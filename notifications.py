@@ -0,0 +1,139 @@
+import logging
+import subprocess
+import threading
+import time
+
+try:
+    from gi.repository import Gio, GLib
+except ImportError: # PyGObject missing: only the notify-send fallback is available
+    Gio = GLib = None
+
+try:
+    from .tracing import span
+except ImportError:
+    from tracing import span
+
+logger = logging.getLogger(__name__)
+
+APP_NAME = "YouTube Video Cutter"
+APP_ICON = "video-x-generic"
+
+NOTIFICATIONS_BUS_NAME = "org.freedesktop.Notifications"
+NOTIFICATIONS_OBJECT_PATH = "/org/freedesktop/Notifications"
+NOTIFICATIONS_INTERFACE = "org.freedesktop.Notifications"
+
+class DBusNotificationBackend:
+    """Sends notifications over one persistent D-Bus connection to org.freedesktop.Notifications.
+
+    Notify() returns an ID; passing it back as replaces_id updates that popup in place.
+    bus_address connects to a specific bus instead of the session bus (e.g. a private test bus).
+    """
+
+    def __init__(self, bus_address=None, timeout_ms=-1):
+        if Gio is None:
+            raise RuntimeError("PyGObject (gi) is not available")
+        if bus_address:
+            flags = Gio.DBusConnectionFlags.AUTHENTICATION_CLIENT | Gio.DBusConnectionFlags.MESSAGE_BUS_CONNECTION
+            self._connection = Gio.DBusConnection.new_for_address_sync(bus_address, flags, None, None)
+        else:
+            self._connection = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+        self._timeout_ms = timeout_ms
+
+    def notify(self, title, text, replaces_id=0):
+        parameters = GLib.Variant("(susssasa{sv}i)", (APP_NAME, replaces_id, APP_ICON, title, text, [], {}, self._timeout_ms))
+        result = self._connection.call_sync(NOTIFICATIONS_BUS_NAME, NOTIFICATIONS_OBJECT_PATH, NOTIFICATIONS_INTERFACE,
+                                            "Notify", parameters, GLib.VariantType("(u)"), Gio.DBusCallFlags.NONE, -1, None)
+        return result.unpack()[0]
+
+class NotifySendBackend:
+    """Fallback that spawns notify-send per notification; popups can't be replaced."""
+
+    def notify(self, title, text, replaces_id=0):
+        subprocess.run(['notify-send', '-a', APP_NAME, '-i', APP_ICON, title, text], check=False)
+        return 0
+
+class Notifier:
+    """Shows notifications, keeping one popup per job and rate limiting progress updates.
+
+    Notifications sharing a key (e.g. a job ID) replace each other's popup. Updates sent with
+    coalesce=True are limited to one per min_interval seconds per key; updates arriving in
+    between are coalesced and only the latest one is shown once the interval has passed. Sends
+    for one key are serialised, so a timer flush and a direct update can't both open a popup.
+    """
+
+    def __init__(self, backend=None, min_interval=1.0):
+        self._backend = backend or self._default_backend()
+        self._min_interval = min_interval
+        self._lock = threading.Lock()
+        self._notification_ids = {}
+        self._send_locks = {} # key -> lock held while a notification for it is sent
+        self._last_sent = {}
+        self._pending = {}
+
+    @staticmethod
+    def _default_backend():
+        try:
+            return DBusNotificationBackend()
+        except Exception as e:
+            logger.info(f"D-Bus notifications unavailable, falling back to notify-send: {e}")
+            return NotifySendBackend()
+
+    def notify(self, title, text, key=None, coalesce=False):
+        if key is None:
+            self._send(None, title, text)
+            return
+        with self._lock:
+            wait = self._last_sent.get(key, 0) + self._min_interval - time.monotonic()
+            if coalesce and wait > 0:
+                already_scheduled = key in self._pending
+                self._pending[key] = (title, text)
+                if not already_scheduled:
+                    timer = threading.Timer(wait, self._flush, args=(key,))
+                    timer.daemon = True
+                    timer.start()
+                return
+            # A non-coalesced update supersedes anything still waiting for this key.
+            self._pending.pop(key, None)
+            self._last_sent[key] = time.monotonic()
+        self._send(key, title, text)
+
+    def forget(self, key):
+        """Drops the popup ID and pending update of a finished job."""
+        with self._lock:
+            self._notification_ids.pop(key, None)
+            self._send_locks.pop(key, None)
+            self._last_sent.pop(key, None)
+            self._pending.pop(key, None)
+
+    def _flush(self, key):
+        with self._lock:
+            pending = self._pending.pop(key, None)
+            if pending is None:
+                return
+            self._last_sent[key] = time.monotonic()
+        self._send(key, *pending)
+
+    def _send(self, key, title, text):
+        if key is None:
+            self._send_with_id(None, title, text)
+            return
+        with self._lock:
+            send_lock = self._send_locks.setdefault(key, threading.Lock())
+        with send_lock: # The popup ID of the first send must be known before the next one for this key
+            self._send_with_id(key, title, text)
+
+    def _send_with_id(self, key, title, text):
+        with self._lock:
+            replaces_id = self._notification_ids.get(key, 0) if key is not None else 0
+        try:
+            with span("notification", backend=type(self._backend).__name__):
+                notification_id = self._backend.notify(title, text, replaces_id)
+        except Exception as e:
+            logger.warning(f"Could not show notification via {type(self._backend).__name__}: {e}")
+            if isinstance(self._backend, NotifySendBackend):
+                return
+            self._backend = NotifySendBackend()
+            notification_id = self._backend.notify(title, text)
+        if key is not None and notification_id:
+            with self._lock:
+                self._notification_ids[key] = notification_id
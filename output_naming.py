@@ -0,0 +1,121 @@
+import fcntl
+import json
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE = "{n}.mp4"
+COUNTER_FILENAME = ".ytc-counter.json"
+
+def _compact_time(time_str):
+    """"01:02:03" -> "1h02m03s", "00:01:30" -> "1m30s"; anything else is returned unchanged."""
+    match = re.fullmatch(r"(\d+):(\d{2}):(\d{2})(?:\.\d+)?", time_str or "")
+    if not match:
+        return time_str or ""
+    hours, minutes, seconds = (int(group) for group in match.groups())
+    if hours:
+        return f"{hours}h{minutes:02d}m{seconds:02d}s"
+    if minutes:
+        return f"{minutes}m{seconds:02d}s"
+    return f"{seconds}s"
+
+def _sanitize(value):
+    """Makes a template value safe to use as (part of) a single path component."""
+    value = re.sub(r'[\\/:*?"<>|\x00-\x1f]+', "_", str(value)).strip(" .")
+    return value[:120] or "_"
+
+class OutputNamer:
+    """Allocates output file names from a template, race-free and in constant time.
+
+    Templates use str.format fields: {n} (sequence number), {title}, {id}, {start} and {end}, and
+    may contain subdirectories (e.g. "{id}/{n}.mp4"). Names are reserved by creating the file with
+    O_CREAT|O_EXCL, so two jobs (or two processes) can never get the same name. {n} comes from a
+    counter persisted per output directory in .ytc-counter.json, updated under an flock, so the
+    directory is never scanned; names that already exist are simply skipped. The counter lives in
+    the directory the numbered files go to, or in the output directory itself when {n} is part of
+    a subdirectory name (e.g. "{n}/{title}.mp4").
+    """
+
+    def __init__(self, directory, template=DEFAULT_TEMPLATE):
+        self.directory = os.path.expanduser(directory)
+        self.template = template or DEFAULT_TEMPLATE
+        self._lock = threading.Lock()
+
+    def allocate(self, title=None, video_id=None, start=None, end=None):
+        """Reserves and returns a new output path (created empty; the caller overwrites it)."""
+        fields = {
+            "title": _sanitize(title or video_id or "video"),
+            "id": _sanitize(video_id or "video"),
+            "start": _sanitize(_compact_time(start) or "0s"),
+            "end": _sanitize(_compact_time(end) or "end"),
+        }
+        try:
+            relative_path = self.template.format(n=0, **fields)
+        except (KeyError, IndexError, ValueError) as e:
+            logger.warning(f"Invalid output filename template '{self.template}' ({e}), using '{DEFAULT_TEMPLATE}'.")
+            self.template = DEFAULT_TEMPLATE
+            relative_path = self.template.format(n=0, **fields)
+        parent = os.path.dirname(os.path.join(self.directory, relative_path))
+
+        if "{n" in self.template:
+            counter_directory = self.directory if "{n" in os.path.dirname(self.template) else parent
+            os.makedirs(counter_directory, exist_ok=True)
+            with self._lock, _locked_counter(counter_directory) as counter:
+                while True:
+                    n = counter["next"]
+                    counter["next"] += 1
+                    path = os.path.join(self.directory, self.template.format(n=n, **fields))
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    if _reserve(path):
+                        return path
+
+        os.makedirs(parent, exist_ok=True)
+        base, extension = os.path.splitext(os.path.join(self.directory, relative_path))
+        path, suffix = base + extension, 1
+        while not _reserve(path):
+            suffix += 1
+            path = f"{base}_{suffix}{extension}"
+        return path
+
+    @staticmethod
+    def release(path):
+        """Removes a reserved path that was never written to (e.g. after a failed job)."""
+        try:
+            if os.path.getsize(path) == 0:
+                os.remove(path)
+        except OSError:
+            pass
+
+def _reserve(path):
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        return False
+    os.close(fd)
+    return True
+
+@contextmanager
+def _locked_counter(directory):
+    """Yields the {"next": n} counter of a directory, holding an exclusive flock until it is written back."""
+    counter_path = os.path.join(directory, COUNTER_FILENAME)
+    with open(counter_path, "a+", encoding="utf-8") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            try:
+                counter = json.loads(f.read() or "{}")
+            except ValueError:
+                logger.warning(f"Corrupt filename counter {counter_path}, starting over at 1.")
+                counter = {}
+            counter["next"] = max(1, int(counter.get("next", 1)))
+            yield counter
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(counter))
+            f.flush()
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,153 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_tracer = None
+_local = threading.local()
+_audit_hook_installed = False
+
+class Span:
+    """One timed operation. Attributes set with set() (e.g. bytes_in/bytes_out) end up in its trace record."""
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = dict(attrs)
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+class Tracer:
+    """Appends one JSON line per finished span to a trace file.
+
+    Each record holds the span name, its start time, wall and CPU seconds (CPU of the calling
+    thread, plus CPU of child processes reaped meanwhile; the latter is process wide, so it is
+    approximate while several jobs run), bytes_in/bytes_out where known, the number of
+    subprocesses spawned by the thread during the span, the enclosing span and any error.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def write(self, record):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+def configure(path):
+    """Starts tracing to path (a JSONL file); an empty path stops tracing."""
+    global _tracer, _audit_hook_installed
+    if _tracer is not None and path and _tracer.path == os.path.expanduser(path):
+        return
+    old_tracer, _tracer = _tracer, None
+    if old_tracer is not None:
+        old_tracer.close()
+    if not path:
+        return
+    if not _audit_hook_installed:
+        sys.addaudithook(_count_spawns) # Audit hooks can't be removed; it does nothing while tracing is off
+        _audit_hook_installed = True
+    _tracer = Tracer(path)
+    logger.info(f"Tracing to {_tracer.path}")
+
+def enabled():
+    return _tracer is not None
+
+def _count_spawns(event, args):
+    if event == "subprocess.Popen" and _tracer is not None:
+        _local.spawns = getattr(_local, "spawns", 0) + 1
+
+def _children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+@contextmanager
+def span(name, **attrs):
+    """Times the enclosed block as a span named name. Yields the Span (a no-op one while tracing is off)."""
+    current = Span(name, attrs)
+    tracer = _tracer
+    if tracer is None:
+        yield current
+        return
+    stack = _local.__dict__.setdefault("stack", [])
+    parent = stack[-1].name if stack else None
+    stack.append(current)
+    spawns_before = getattr(_local, "spawns", 0)
+    started_at = time.time()
+    wall_before, cpu_before, children_cpu_before = time.perf_counter(), time.thread_time(), _children_cpu()
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        stack.pop()
+        record = {
+            'name': name,
+            'start': started_at,
+            'wall_s': round(time.perf_counter() - wall_before, 6),
+            'cpu_s': round(time.thread_time() - cpu_before, 6),
+            'child_cpu_s': round(_children_cpu() - children_cpu_before, 6),
+            'spawns': getattr(_local, "spawns", 0) - spawns_before,
+            'thread': threading.current_thread().name,
+            'parent': parent,
+        }
+        record.update(current.attrs)
+        if error:
+            record['error'] = error[:500]
+        try:
+            tracer.write(record)
+        except (OSError, ValueError) as e: # ValueError: the trace file was closed by configure()
+            logger.warning(f"Could not write trace record for {name}: {e}")
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path) if isinstance(path, str) else None
+    except OSError:
+        return None
+
+def traced(name, input_arg=None, output_arg=None, download=False):
+    """Decorator recording every call of a function as a span.
+
+    input_arg/output_arg name the parameters holding the file read/written; their sizes become
+    bytes_in/bytes_out (a str return value is taken as the output path when it exists). For
+    downloads (download=True) the bytes received equal the bytes written.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            arguments = signature.bind_partial(*args, **kwargs).arguments
+            with span(name) as current:
+                if input_arg:
+                    current.set(bytes_in=_file_size(arguments.get(input_arg)))
+                result = func(*args, **kwargs)
+                output_path = result if isinstance(result, str) and os.path.exists(result) else arguments.get(output_arg)
+                if output_arg or download:
+                    current.set(bytes_out=_file_size(output_path))
+                if download:
+                    current.set(bytes_in=current.attrs.get('bytes_out'))
+                return result
+        return wrapper
+    return decorator
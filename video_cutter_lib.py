@@ -1,63 +1,214 @@
 import subprocess
 import os
 import re
+import hashlib
+import http.client
+import json
+import math
+import shutil
+import tempfile
+import selectors
+import signal
+import threading
+import time
+import urllib.parse
+from collections import deque, namedtuple
 
-def _process_yt_dlp_output(process, progress_callback, action_name):
-    """Helper to process Popen stdout for progress and collect all output."""
-    all_stdout_lines = []
-    if process.stdout:
-        for line_bytes in iter(process.stdout.readline, b''):
-            line = line_bytes.decode('utf-8', errors='replace').strip()
-            if not line:
-                continue
-            all_stdout_lines.append(line)
-            # print(f"▶ video_cutter_lib ({action_name}): STDOUT line: {line}") # Verbose logging
-            
+try:
+    from .tracing import traced
+except ImportError:
+    from tracing import traced
+
+# Number of output lines kept per pipe for error reports.
+OUTPUT_TAIL_LINES = 50
+# Longest partial line buffered before it is handled as a line anyway.
+MAX_PENDING_LINE_BYTES = 64 * 1024
+
+FFMPEG_PROGRESS_KEYS = ("out_time_us", "out_time_ms", "total_size", "speed", "progress")
+
+YT_DLP_PROGRESS_PREFIX = "YTC_PROGRESS"
+# Machine-readable progress: one space separated record per update, "NA" for unknown fields.
+YT_DLP_PROGRESS_TEMPLATE = (
+    "download:" + YT_DLP_PROGRESS_PREFIX +
+    " %(progress.downloaded_bytes)s %(progress.total_bytes)s %(progress.total_bytes_estimate)s"
+    " %(progress.speed)s %(progress.eta)s %(progress.fragment_index)s %(progress.fragment_count)s"
+)
+
+def _format_bytes(num_bytes):
+    for unit in ("B", "KB", "MB", "GB"):
+        if num_bytes < 1024 or unit == "GB":
+            return f"{num_bytes:.1f} {unit}" if unit != "B" else f"{int(num_bytes)} B"
+        num_bytes /= 1024.0
+
+class ProgressEvent(namedtuple("ProgressEvent", ["stage", "percent", "downloaded_bytes", "total_bytes", "speed", "eta", "fragment_index", "fragment_count"])):
+    """A progress update from yt-dlp (stage "download") or ffmpeg (stage "ffmpeg").
+
+    Unknown fields are None. str() gives a short human readable summary.
+    """
+    __slots__ = ()
+
+    @property
+    def percent_str(self):
+        return f"{self.percent:.1f}%" if self.percent is not None else ""
+
+    def __str__(self):
+        parts = [self.percent_str or "..."]
+        if self.total_bytes:
+            parts.append(f"of {_format_bytes(self.total_bytes)}")
+        elif self.downloaded_bytes:
+            parts.append(f"({_format_bytes(self.downloaded_bytes)})")
+        if self.speed:
+            parts.append(f"at {_format_bytes(self.speed)}/s")
+        if self.fragment_index and self.fragment_count:
+            parts.append(f"[fragment {self.fragment_index}/{self.fragment_count}]")
+        if self.eta is not None:
+            parts.append(f"ETA {int(self.eta) // 60}:{int(self.eta) % 60:02d}")
+        return " ".join(parts)
+
+def _parse_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _parse_yt_dlp_progress(line):
+    """Parses a YT_DLP_PROGRESS_TEMPLATE line (or a plain "[download]  10.5%" line) into a ProgressEvent."""
+    if line.startswith(YT_DLP_PROGRESS_PREFIX + " "):
+        fields = [_parse_number(value) for value in line.split()[1:8]]
+        if len(fields) != 7:
+            return None
+        downloaded, total, total_estimate, speed, eta, fragment_index, fragment_count = fields
+        total = total or total_estimate
+        if downloaded is not None and total:
+            percent = min(100.0, downloaded * 100.0 / total)
+        elif fragment_index and fragment_count:
+            percent = min(100.0, fragment_index * 100.0 / fragment_count)
+        else:
+            percent = None
+        return ProgressEvent("download", percent, downloaded, total, speed, eta,
+                             int(fragment_index) if fragment_index else None,
+                             int(fragment_count) if fragment_count else None)
+    match = re.search(r"\[download\]\s+([\d\.]+)%", line)
+    if match:
+        return ProgressEvent("download", float(match.group(1)), None, None, None, None, None, None)
+    return None
+
+def _drain_process(process, on_stdout_line=None, on_stderr_line=None):
+    """Reads stdout and stderr of a Popen (binary pipes) concurrently until both close, then waits for it.
+
+    Lines (split on newlines and carriage returns) are passed to the handlers as they arrive. Only the last
+    OUTPUT_TAIL_LINES lines of each pipe are kept, so chatty processes can neither fill a pipe
+    and block nor grow memory. Returns (returncode, stdout_tail, stderr_tail).
+    """
+    tails = {}
+    pending = {}
+    selector = selectors.DefaultSelector()
+    for name, stream, handler in (("stdout", process.stdout, on_stdout_line), ("stderr", process.stderr, on_stderr_line)):
+        tails[name] = deque(maxlen=OUTPUT_TAIL_LINES)
+        if stream is not None:
+            selector.register(stream, selectors.EVENT_READ, (name, handler))
+            pending[name] = b""
+    try:
+        while selector.get_map():
+            for key, _ in selector.select():
+                name, handler = key.data
+                chunk = os.read(key.fd, 65536)
+                if chunk:
+                    raw_lines = re.split(rb"[\r\n]", pending[name] + chunk)
+                    pending[name] = raw_lines.pop()
+                    if len(pending[name]) > MAX_PENDING_LINE_BYTES:
+                        raw_lines.append(pending[name])
+                        pending[name] = b""
+                else:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                    raw_lines = [pending[name]]
+                    pending[name] = b""
+                for raw_line in raw_lines:
+                    line = raw_line.decode('utf-8', errors='replace').strip()
+                    if not line:
+                        continue
+                    tails[name].append(line)
+                    if handler:
+                        handler(line)
+    finally:
+        selector.close()
+    process.wait()
+    return process.returncode, "\n".join(tails["stdout"]), "\n".join(tails["stderr"])
+
+def kill_process_group(process):
+    """Kills a process started by this module together with its children.
+
+    Every yt-dlp/ffmpeg process here is started in its own session (start_new_session=True), so
+    its process group holds the ffmpeg yt-dlp runs for section downloads and merges as well.
+    Processes that lead no group of their own (or Popen-like handles without a pid) are killed
+    directly.
+    """
+    if process.poll() is not None:
+        return
+    pid = getattr(process, "pid", None)
+    try:
+        if pid and os.getpgid(pid) == pid:
+            os.killpg(pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass # Exited in the meantime
+
+def _pump_lines(stream, tail, on_line=None):
+    """Reads a binary pipe line by line until EOF into a bounded deque, passing lines to on_line."""
+    for line_bytes in iter(stream.readline, b''):
+        line = line_bytes.decode('utf-8', errors='replace').strip()
+        if not line:
+            continue
+        tail.append(line)
+        if on_line:
+            on_line(line)
+    stream.close()
+
+def _process_yt_dlp_output(process, progress_callback, action_name, on_stdout_line=None):
+    """Drains a yt-dlp Popen, turning progress template lines into ProgressEvents for progress_callback.
+
+    Other stdout lines go to on_stdout_line. Returns (returncode, stdout_tail, stderr_tail).
+    """
+    def handle_stdout_line(line):
+        event = _parse_yt_dlp_progress(line)
+        if event is not None:
             if progress_callback:
-                # Try to match a line that is primarily a percentage, possibly with whitespace
-                # This assumes the --progress-template is outputting just the percentage string.
-                # Example: "  10.5%"
-                match = re.fullmatch(r"\s*([\d\.]+\s*%)\s*", line) # Match full line as percentage
-                if match:
-                    percentage = match.group(1).strip()
-                    progress_callback(percentage)
-                # Keep the old fallback just in case, though it might be less likely to hit with the new template
-                elif "[download]" in line: # Check if it's a standard yt-dlp download line
-                    match_default = re.search(r"\[download\]\s+([\d\.]+%)", line)
-                    if match_default:
-                        percentage = match_default.group(1).strip()
-                        progress_callback(percentage)
-        process.stdout.close()
-    
-    process.wait() 
-    return process.returncode, all_stdout_lines
+                progress_callback(event)
+        elif on_stdout_line:
+            on_stdout_line(line)
+
+    return_code, stdout_tail, stderr_tail = _drain_process(process, handle_stdout_line)
+    if stderr_tail.strip():
+        print(f"▶ video_cutter_lib ({action_name}): STDERR (tail):\n{stderr_tail}")
+    return return_code, stdout_tail, stderr_tail
+
+@traced("download_video", output_arg="output_path", download=True)
+def download_video(url, output_path, progress_callback=None, process_callback=None):
+    """Downloads the video from the specified URL, with progress reporting.
 
-def download_video(url, output_path, progress_callback=None):
-    """Downloads the video from the specified URL, with progress reporting."""
+    process_callback, if given, receives the yt-dlp Popen as soon as it starts (e.g. to kill it on cancel).
+    """
     print(f"▶ video_cutter_lib: Downloading video for cut: {url} -> {output_path}")
     command = [
         "yt-dlp",
         "--no-playlist",
         "--progress", 
         "--newline", # Force progress on new lines
-        "--progress-template", "%(progress._percent_str)s", # Simplest percentage template
+        "--progress-template", YT_DLP_PROGRESS_TEMPLATE, # Machine-readable progress, see _parse_yt_dlp_progress
         "--merge-output-format", "mp4",
         "-o", output_path,
         url
     ]
     try:
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=False)
-        return_code, stdout_lines = _process_yt_dlp_output(process, progress_callback, "cut_download")
-        
-        stderr_output = ""
-        if process.stderr:
-            stderr_output = process.stderr.read().decode('utf-8', errors='replace')
-            process.stderr.close()
-            if stderr_output.strip():
-                 print(f"▶ video_cutter_lib (cut_download): STDERR:\n{stderr_output}")
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=False, start_new_session=True)
+        if process_callback:
+            process_callback(process)
+        return_code, stdout_tail, stderr_output = _process_yt_dlp_output(process, progress_callback, "cut_download")
 
         if return_code != 0:
-            raise subprocess.CalledProcessError(return_code, command, output="\n".join(stdout_lines), stderr=stderr_output)
+            raise subprocess.CalledProcessError(return_code, command, output=stdout_tail, stderr=stderr_output)
         
         print(f"▶ video_cutter_lib: Video download for cut complete: {output_path}")
     except subprocess.CalledProcessError as e:
@@ -69,8 +220,250 @@ def download_video(url, output_path, progress_callback=None):
         print(f"❌ video_cutter_lib: An unexpected error occurred during video download for cut: {e}")
         raise
 
-def cut_video(input_path, start_time, end_time, output_path):
-    """Cuts the video in the specified time range."""
+def time_to_seconds(time_str):
+    """Converts an "HH:MM:SS[.fff]" string (or a plain number) to seconds."""
+    if isinstance(time_str, (int, float)):
+        return float(time_str)
+    total = 0.0
+    for part in str(time_str).strip().split(":"):
+        total = total * 60 + float(part)
+    return total
+
+def seconds_to_time(seconds):
+    """Converts seconds to the "HH:MM:SS[.fff]" form accepted by ffmpeg and yt-dlp."""
+    seconds = max(0.0, float(seconds))
+    whole = int(seconds)
+    hours, rest = divmod(whole, 3600)
+    minutes, secs = divmod(rest, 60)
+    fraction = round(seconds - whole, 3)
+    if fraction >= 0.001:
+        return f"{hours:02d}:{minutes:02d}:{secs:02d}.{int(round(fraction * 1000)):03d}"
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}"
+
+def normalize_video_id(url):
+    """Returns a stable ID for a video URL: the YouTube video ID when recognisable, else a hash of the URL."""
+    parsed = urllib.parse.urlsplit(url.strip())
+    host = parsed.netloc.lower().split(":")[0]
+    if host.startswith("www."):
+        host = host[4:]
+    if host.startswith("m."):
+        host = host[2:]
+    video_id = None
+    if host == "youtu.be":
+        video_id = parsed.path.strip("/").split("/")[0]
+    elif host.endswith("youtube.com"):
+        query = urllib.parse.parse_qs(parsed.query)
+        if query.get("v"):
+            video_id = query["v"][0]
+        else:
+            match = re.match(r"/(?:shorts|embed|live|v)/([^/?#]+)", parsed.path)
+            if match:
+                video_id = match.group(1)
+    if video_id and re.fullmatch(r"[A-Za-z0-9_-]{6,}", video_id):
+        return f"yt-{video_id}"
+    normalized_url = urllib.parse.urlunsplit((parsed.scheme.lower(), parsed.netloc.lower(), parsed.path, parsed.query, ""))
+    return "url-" + hashlib.sha1(normalized_url.encode("utf-8")).hexdigest()[:16]
+
+def _fetch_info_json(url, process_callback=None):
+    """Returns yt-dlp's info dict (-J) for url, including the selected formats and their media URLs."""
+    command = ["yt-dlp", "--no-playlist", "--no-warnings", "-J", url]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+    if process_callback:
+        process_callback(process)
+    stdout_output, stderr_output = process.communicate()
+    stderr_text = stderr_output.decode('utf-8', errors='replace')
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command, stderr=stderr_text[-2000:])
+    return json.loads(stdout_output.decode('utf-8', errors='replace'))
+
+def fetch_video_metadata(url, process_callback=None):
+    """Fetches video metadata with yt-dlp (no download).
+
+    Returns a dict with 'id', 'title', 'duration' (seconds or None), 'filesize' (bytes of the
+    selected format, exact or approximate, or None), 'tbr' (total bitrate in kbit/s or None) and
+    a short 'formats' list. Raises subprocess.CalledProcessError for dead or unsupported URLs.
+    """
+    info = _fetch_info_json(url, process_callback)
+
+    # The selected format is either a single format or several merged ones (requested_formats).
+    selected = info.get("requested_formats") or [info]
+    sizes = [f.get("filesize") or f.get("filesize_approx") for f in selected]
+    bitrates = [f.get("tbr") for f in selected]
+    formats = []
+    for f in info.get("formats") or []:
+        formats.append({
+            'format_id': f.get("format_id"),
+            'ext': f.get("ext"),
+            'height': f.get("height"),
+            'vcodec': f.get("vcodec"),
+            'acodec': f.get("acodec"),
+            'filesize': f.get("filesize") or f.get("filesize_approx"),
+            'tbr': f.get("tbr"),
+        })
+    return {
+        'id': info.get("id"),
+        'title': info.get("title"),
+        'duration': info.get("duration"),
+        'filesize': sum(sizes) if all(sizes) else None,
+        'tbr': sum(bitrates) if all(bitrates) else None,
+        'formats': formats,
+    }
+
+def fetch_playlist_entries(url, process_callback=None):
+    """Lists the videos of a playlist (or channel) URL without downloading or resolving them.
+
+    Returns a list of {'url', 'id', 'title'} dicts in playlist order; a single video URL yields one entry.
+    """
+    command = ["yt-dlp", "--flat-playlist", "--yes-playlist", "--no-warnings", "-J", url]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+    if process_callback:
+        process_callback(process)
+    stdout_output, stderr_output = process.communicate()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command, stderr=stderr_output.decode('utf-8', errors='replace')[-2000:])
+    info = json.loads(stdout_output.decode('utf-8', errors='replace'))
+    entries = []
+    for entry in info.get("entries") or [info]:
+        if not entry:
+            continue # Unavailable (private/deleted) playlist items
+        entry_url = entry.get("webpage_url") or entry.get("url")
+        if entry_url and not entry_url.startswith(("http://", "https://")) and entry.get("id"):
+            entry_url = f"https://www.youtube.com/watch?v={entry['id']}"
+        if entry_url:
+            entries.append({'url': entry_url, 'id': entry.get("id"), 'title': entry.get("title")})
+    return entries
+
+def estimate_range_bytes(metadata, start_time=None, end_time=None, keyframe_padding=0):
+    """Estimates the bytes needed for [start_time - keyframe_padding, end_time] (the whole video without times)."""
+    duration = metadata.get('duration')
+    if start_time is None or end_time is None:
+        span = duration
+    else:
+        span = time_to_seconds(end_time) - max(0.0, time_to_seconds(start_time) - keyframe_padding)
+        if duration:
+            span = min(span, duration)
+    if not span or span <= 0:
+        return None
+    if metadata.get('filesize') and duration:
+        return int(metadata['filesize'] * span / duration)
+    if metadata.get('tbr'):
+        return int(metadata['tbr'] * 1000 / 8 * span)
+    return None
+
+@traced("download_section", output_arg="output_path", download=True)
+def download_section(url, start_time, end_time, output_path, progress_callback=None, keyframe_padding=10, process_callback=None):
+    """Downloads only the part of the video covering [start_time - keyframe_padding, end_time].
+
+    yt-dlp fetches just the byte ranges / fragments needed for the section. The returned dict
+    holds the section path, the section bounds in seconds ('offset'/'offset_end'), cut times
+    relative to the section start ('start'/'end'), the bytes
+    actually fetched and the full source size reported by yt-dlp (None when unknown).
+    Raises subprocess.CalledProcessError when the source can't be fetched by range, so callers
+    can fall back to download_video.
+    """
+    start_seconds = time_to_seconds(start_time)
+    end_seconds = time_to_seconds(end_time)
+    section_start = max(0.0, start_seconds - max(0.0, float(keyframe_padding)))
+    section_range = f"*{seconds_to_time(section_start)}-{seconds_to_time(end_seconds)}"
+    print(f"▶ video_cutter_lib: Downloading section {section_range} for cut: {url} -> {output_path}")
+    command = [
+        "yt-dlp",
+        "--no-playlist",
+        "--progress",
+        "--newline", # Force progress on new lines
+        "--progress-template", YT_DLP_PROGRESS_TEMPLATE, # Machine-readable progress, see _parse_yt_dlp_progress
+        "--download-sections", section_range,
+        "--no-simulate",
+        "--print", "before_dl:YTC_FULL_SIZE %(filesize,filesize_approx)s", # Full source size, for the fetched/full report
+        "--merge-output-format", "mp4",
+        "-o", output_path,
+        url
+    ]
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=False, start_new_session=True)
+        if process_callback:
+            process_callback(process)
+        reported_sizes = []
+        def handle_stdout_line(line):
+            if line.startswith("YTC_FULL_SIZE "):
+                size_str = line.split(" ", 1)[1].strip()
+                if size_str.isdigit():
+                    reported_sizes.append(int(size_str))
+        return_code, stdout_tail, stderr_output = _process_yt_dlp_output(process, progress_callback, "section_download", on_stdout_line=handle_stdout_line)
+
+        if return_code != 0 or not os.path.exists(output_path):
+            raise subprocess.CalledProcessError(return_code or 1, command, output=stdout_tail, stderr=stderr_output)
+
+        full_size = reported_sizes[-1] if reported_sizes else None
+        bytes_fetched = os.path.getsize(output_path)
+        if full_size:
+            print(f"▶ video_cutter_lib: Section download complete: fetched {bytes_fetched} of {full_size} bytes ({bytes_fetched * 100.0 / full_size:.1f}%)")
+        else:
+            print(f"▶ video_cutter_lib: Section download complete: fetched {bytes_fetched} bytes (full size unknown)")
+
+        return {
+            'path': output_path,
+            'offset': section_start,
+            'offset_end': end_seconds,
+            'start': seconds_to_time(start_seconds - section_start),
+            'end': seconds_to_time(end_seconds - section_start),
+            'bytes_fetched': bytes_fetched,
+            'full_size': full_size,
+        }
+    except subprocess.CalledProcessError as e:
+        print(f"❌ video_cutter_lib: Section download error: {e}")
+        print(f"STDOUT:\n{e.stdout}")
+        print(f"STDERR:\n{e.stderr}")
+        raise
+    except Exception as e:
+        print(f"❌ video_cutter_lib: An unexpected error occurred during section download: {e}")
+        raise
+
+def _parse_ffmpeg_progress(values, duration):
+    """Builds a ProgressEvent from one block of ffmpeg "-progress" key=value pairs."""
+    out_time_us = _parse_number(values.get("out_time_us") or values.get("out_time_ms"))
+    out_seconds = out_time_us / 1000000.0 if out_time_us is not None and out_time_us >= 0 else None
+    percent = None
+    eta = None
+    if values.get("progress") == "end":
+        percent = 100.0
+    elif out_seconds is not None and duration:
+        percent = min(100.0, out_seconds * 100.0 / duration)
+        speed_factor = _parse_number(values.get("speed", "").rstrip("x"))
+        if speed_factor:
+            eta = max(0.0, (duration - out_seconds) / speed_factor)
+    total_size = _parse_number(values.get("total_size"))
+    return ProgressEvent("ffmpeg", percent, int(total_size) if total_size is not None else None, None, None, eta, None, None)
+
+def _run_ffmpeg(command, process_callback=None, progress_callback=None, duration=None, on_stdout_line=None):
+    """Runs an ffmpeg/ffprobe command to completion. Returns the (stdout, stderr) tails; raises CalledProcessError on failure.
+
+    With a progress_callback, "-progress pipe:1" is added and each progress block is reported as a
+    ProgressEvent, with percent relative to duration (seconds of output expected).
+    """
+    progress_values = {}
+    def handle_stdout_line(line):
+        key, separator, value = line.partition("=")
+        if progress_callback and separator and key in FFMPEG_PROGRESS_KEYS:
+            progress_values[key] = value.strip()
+            if key == "progress":
+                progress_callback(_parse_ffmpeg_progress(progress_values, duration))
+        elif on_stdout_line:
+            on_stdout_line(line)
+
+    if progress_callback:
+        command = command[:1] + ["-progress", "pipe:1", "-nostats"] + command[1:]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+    if process_callback:
+        process_callback(process)
+    return_code, stdout_tail, stderr_tail = _drain_process(process, handle_stdout_line)
+    if return_code != 0:
+        raise subprocess.CalledProcessError(return_code, command, output=stdout_tail, stderr=stderr_tail)
+    return stdout_tail, stderr_tail
+
+@traced("cut_video", input_arg="input_path", output_arg="output_path")
+def cut_video(input_path, start_time, end_time, output_path, process_callback=None, progress_callback=None):
+    """Cuts the video in the specified time range. progress_callback receives ffmpeg ProgressEvents."""
     print(f"▶ video_cutter_lib: Cutting video: {input_path} [{start_time}-{end_time}] -> {output_path}")
     command = [
         "ffmpeg",
@@ -82,8 +475,9 @@ def cut_video(input_path, start_time, end_time, output_path):
         output_path
     ]
     try:
-        result = subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8')
-        print(f"▶ video_cutter_lib: Video cutting command output:\nSTDOUT:\n{result.stdout}\nSTDERR:\n{result.stderr}")
+        duration = time_to_seconds(end_time) - time_to_seconds(start_time)
+        stdout_output, stderr_output = _run_ffmpeg(command, process_callback, progress_callback, duration)
+        print(f"▶ video_cutter_lib: Video cutting command output (tail):\nSTDOUT:\n{stdout_output}\nSTDERR:\n{stderr_output}")
         print("▶ video_cutter_lib: Video cutting complete.")
     except subprocess.CalledProcessError as e:
         print(f"❌ video_cutter_lib: Video cutting error: {e}")
@@ -94,8 +488,660 @@ def cut_video(input_path, start_time, end_time, output_path):
         print(f"❌ video_cutter_lib: An unexpected error occurred during video cutting: {e}")
         raise
 
-def download_full_video(url, full_output_path, progress_callback=None):
-    """Downloads the full video from the specified URL to the given full_output_path, with progress."""
+@traced("cut_segments", input_arg="input_path")
+def cut_segments(input_path, segments, output_paths, process_callback=None):
+    """Cuts several (start_time, end_time) segments out of one source in a single ffmpeg run.
+
+    The source is opened once per segment with its own input-side seek, and each input is
+    stream-copied to the matching entry of output_paths.
+    """
+    if len(segments) != len(output_paths):
+        raise ValueError("cut_segments needs exactly one output path per segment")
+    print(f"▶ video_cutter_lib: Cutting {len(segments)} segments from {input_path}")
+    command = ["ffmpeg", "-y"]
+    for start_time, end_time in segments:
+        command += ["-ss", start_time, "-to", end_time, "-i", input_path]
+    for index, output_path in enumerate(output_paths):
+        command += ["-map", f"{index}:v?", "-map", f"{index}:a?", "-c", "copy", output_path]
+    try:
+        _run_ffmpeg(command, process_callback)
+        print(f"▶ video_cutter_lib: Segment cutting complete: {', '.join(output_paths)}")
+    except subprocess.CalledProcessError as e:
+        print(f"❌ video_cutter_lib: Segment cutting error: {e}")
+        print(f"STDERR:\n{e.stderr}")
+        raise
+    except Exception as e:
+        print(f"❌ video_cutter_lib: An unexpected error occurred during segment cutting: {e}")
+        raise
+
+def concat_videos(input_paths, output_path, process_callback=None):
+    """Joins clips cut from the same source into one file with the concat demuxer (stream copy, no re-encode)."""
+    print(f"▶ video_cutter_lib: Concatenating {len(input_paths)} clips -> {output_path}")
+    list_path = output_path + ".concat.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for input_path in input_paths:
+            escaped_path = os.path.abspath(input_path).replace("'", "'\\''")
+            f.write(f"file '{escaped_path}'\n")
+    command = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", output_path]
+    try:
+        _run_ffmpeg(command, process_callback)
+        print(f"▶ video_cutter_lib: Concatenation complete: {output_path}")
+    except subprocess.CalledProcessError as e:
+        print(f"❌ video_cutter_lib: Concatenation error: {e}")
+        print(f"STDERR:\n{e.stderr}")
+        raise
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+@traced("stream_cut_video", output_arg="output_path")
+def stream_cut_video(url, start_time, end_time, output_path, progress_callback=None, process_callback=None):
+    """Cuts a clip while the video downloads, without writing the source to disk.
+
+    yt-dlp writes a single-file format to stdout, which is relayed into ffmpeg's stdin. ffmpeg
+    stops once it has written end_time - start_time of output; the relay then sees the closed
+    pipe and kills yt-dlp, so the rest of the video is never fetched. Disk usage is bounded by
+    the clip itself. yt-dlp's "-f b" is YouTube's best progressive format, usually 360p, so
+    stream cuts are lower quality than downloaded ones. Returns a dict with 'bytes_read' (bytes
+    taken from yt-dlp) and 'peak_disk_bytes' (the largest output size seen, sampled after every
+    relayed chunk and once ffmpeg exits).
+    """
+    print(f"▶ video_cutter_lib: Stream cutting video: {url} [{start_time}-{end_time}] -> {output_path}")
+    duration = time_to_seconds(end_time) - time_to_seconds(start_time)
+    download_command = [
+        "yt-dlp",
+        "--no-playlist",
+        "--progress",
+        "--newline", # Force progress on new lines
+        "--progress-template", YT_DLP_PROGRESS_TEMPLATE, # Machine-readable progress, see _parse_yt_dlp_progress
+        "-f", "b", # Progressive single-file format; separate audio/video can't be merged on a pipe
+        "-o", "-",
+        url
+    ]
+    cut_command = [
+        "ffmpeg",
+        "-y",
+        "-progress", "pipe:1",
+        "-nostats",
+        "-i", "pipe:0",
+        "-ss", start_time,
+        "-t", f"{duration:.3f}",
+        "-c", "copy",
+        output_path
+    ]
+    download_process = subprocess.Popen(download_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+    if process_callback:
+        process_callback(download_process)
+    try:
+        cut_process = subprocess.Popen(cut_command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+    except Exception:
+        kill_process_group(download_process)
+        download_process.wait()
+        raise
+    if process_callback:
+        process_callback(cut_process)
+
+    # The relay below owns yt-dlp's stdout, so the remaining pipes are drained by reader threads,
+    # each keeping only a bounded tail. Progress comes from ffmpeg: the clip end is where the work stops.
+    download_stderr_tail = deque(maxlen=OUTPUT_TAIL_LINES)
+    cut_stderr_tail = deque(maxlen=OUTPUT_TAIL_LINES)
+    progress_values = {}
+    def handle_cut_progress_line(line):
+        key, _, value = line.partition("=")
+        if key in FFMPEG_PROGRESS_KEYS:
+            progress_values[key] = value.strip()
+            if key == "progress" and progress_callback:
+                progress_callback(_parse_ffmpeg_progress(progress_values, duration))
+    readers = [
+        threading.Thread(target=_pump_lines, args=(download_process.stderr, download_stderr_tail), daemon=True),
+        threading.Thread(target=_pump_lines, args=(cut_process.stderr, cut_stderr_tail), daemon=True),
+        threading.Thread(target=_pump_lines, args=(cut_process.stdout, deque(maxlen=1), handle_cut_progress_line), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    def output_size():
+        try:
+            return os.path.getsize(output_path)
+        except OSError:
+            return 0
+
+    bytes_read = 0
+    peak_disk_bytes = 0
+    stopped_early = False
+    try:
+        while True:
+            chunk = download_process.stdout.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            bytes_read += len(chunk)
+            try:
+                cut_process.stdin.write(chunk)
+            except (BrokenPipeError, ValueError):
+                stopped_early = True
+                break
+            peak_disk_bytes = max(peak_disk_bytes, output_size())
+    finally:
+        try:
+            cut_process.stdin.close()
+        except BrokenPipeError:
+            pass
+        if stopped_early and download_process.poll() is None:
+            kill_process_group(download_process) # ffmpeg has everything it needs, abort the rest of the download
+        download_process.stdout.close()
+        cut_return_code = cut_process.wait()
+        download_return_code = download_process.wait()
+        for reader in readers:
+            reader.join()
+
+    cut_stderr = "\n".join(cut_stderr_tail)
+    if cut_return_code != 0:
+        print(f"❌ video_cutter_lib: Stream cut ffmpeg error:\n{cut_stderr}")
+        raise subprocess.CalledProcessError(cut_return_code, cut_command, stderr=cut_stderr)
+    if download_return_code != 0 and not stopped_early:
+        download_stderr = "\n".join(download_stderr_tail)
+        print(f"❌ video_cutter_lib: Stream cut yt-dlp error:\n{download_stderr}")
+        raise subprocess.CalledProcessError(download_return_code, download_command, stderr=download_stderr)
+
+    peak_disk_bytes = max(peak_disk_bytes, output_size())
+    print(f"▶ video_cutter_lib: Stream cut complete: read {bytes_read} bytes{' (download stopped early)' if stopped_early else ''}, peak disk usage {peak_disk_bytes} bytes")
+    return {'bytes_read': bytes_read, 'peak_disk_bytes': peak_disk_bytes, 'stopped_early': stopped_early}
+
+KEYFRAME_INDEX_SUFFIX = ".keyframes.json"
+
+# Encoders used to re-encode boundary GOPs so they match the stream-copied middle of a smart cut.
+SMART_CUT_ENCODERS = {
+    "h264": "libx264",
+    "hevc": "libx265",
+    "vp9": "libvpx-vp9",
+    "av1": "libaom-av1",
+    "mpeg4": "mpeg4",
+}
+
+# Codecs whose pieces are joined as MPEG-TS (Annex-B, parameter sets in-band before every keyframe).
+# The mp4 concat keeps only the first piece's extradata, so re-encoded head/tail pieces would be
+# decoded with the source's SPS/PPS otherwise.
+SMART_CUT_ANNEXB_CODECS = {"h264", "hevc"}
+
+# Keyframe times from ffprobe are rounded to the microsecond, so seeks and durations around a
+# keyframe keep this much slack (far below any frame interval) on the side that keeps the
+# keyframe in its own piece. Without it a stream-copy seek that lands just before a keyframe
+# starts at the previous one and duplicates a whole GOP.
+SMART_CUT_SEEK_MARGIN = 0.0005
+
+def _precise_seconds(seconds):
+    """Formats seconds for -ss/-t with full (microsecond) precision; seconds_to_time() rounds to the millisecond."""
+    return f"{max(0.0, seconds):.6f}"
+
+def _encoder_options(stream_info):
+    """Returns the ffmpeg options that make a re-encoded piece match the source stream's profile and level."""
+    codec = stream_info.get("codec_name")
+    profile = str(stream_info.get("profile") or "").lower()
+    level = stream_info.get("level")
+    options = []
+    if codec == "h264":
+        profile = {"constrained baseline": "baseline", "high 10": "high10", "high 4:2:2": "high422",
+                   "high 4:4:4 predictive": "high444"}.get(profile, profile)
+        if profile in ("baseline", "main", "high", "high10", "high422", "high444"):
+            options += ["-profile:v", profile]
+        if isinstance(level, int) and level > 0:
+            options += ["-level:v", f"{level / 10:g}"]
+    elif codec == "hevc":
+        profile = profile.replace(" ", "")
+        if profile in ("main", "main10", "mainstillpicture"):
+            options += ["-profile:v", profile]
+    return options
+
+def _probe_video_stream(input_path):
+    """Returns codec_name/profile/level/pix_fmt/width/height of the first video stream, via ffprobe."""
+    command = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name,profile,level,pix_fmt,width,height",
+        "-of", "json",
+        input_path
+    ]
+    result = subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8', errors='replace')
+    streams = json.loads(result.stdout or "{}").get("streams", [])
+    if not streams:
+        raise ValueError(f"No video stream found in {input_path}")
+    return streams[0]
+
+def build_keyframe_index(input_path, process_callback=None):
+    """Returns the sorted keyframe timestamps (seconds) of the first video stream.
+
+    The index is read from packet flags with ffprobe (no decoding) and cached next to the source
+    as <input_path>.keyframes.json; the cache is reused while the source size and mtime match.
+    """
+    index_path = input_path + KEYFRAME_INDEX_SUFFIX
+    source_stat = os.stat(input_path)
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("size") == source_stat.st_size and cached.get("mtime") == source_stat.st_mtime:
+            return cached["keyframes"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    print(f"▶ video_cutter_lib: Building keyframe index for {input_path}")
+    command = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=print_section=0",
+        input_path
+    ]
+    keyframes = []
+    def handle_packet_line(line):
+        fields = line.split(",")
+        if len(fields) >= 2 and "K" in fields[1] and fields[0] not in ("", "N/A"):
+            keyframes.append(float(fields[0]))
+    _run_ffmpeg(command, process_callback, on_stdout_line=handle_packet_line)
+    keyframes.sort()
+
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"size": source_stat.st_size, "mtime": source_stat.st_mtime, "keyframes": keyframes}, f)
+    os.replace(tmp_path, index_path)
+    print(f"▶ video_cutter_lib: Keyframe index built: {len(keyframes)} keyframes")
+    return keyframes
+
+def _encode_video_piece(input_path, start_seconds, end_seconds, output_path, stream_info, process_callback=None):
+    encoder = SMART_CUT_ENCODERS.get(stream_info.get("codec_name"), "libx264")
+    command = [
+        "ffmpeg", "-y",
+        "-ss", _precise_seconds(start_seconds),
+        "-i", input_path,
+        "-t", _precise_seconds(end_seconds - start_seconds),
+        "-map", "0:v:0", "-an",
+        "-c:v", encoder,
+    ] + _encoder_options(stream_info)
+    if stream_info.get("pix_fmt"):
+        command += ["-pix_fmt", stream_info["pix_fmt"]]
+    command.append(output_path)
+    _run_ffmpeg(command, process_callback)
+
+@traced("smart_cut_video", input_arg="input_path", output_arg="output_path")
+def smart_cut_video(input_path, start_time, end_time, output_path, process_callback=None):
+    """Frame-accurate cut that only re-encodes the partial GOPs at the clip boundaries.
+
+    Video from the first keyframe after start_time up to the last keyframe before end_time is
+    stream-copied; the head and tail pieces are re-encoded with the source codec, profile and
+    level. H.264/HEVC pieces are kept as MPEG-TS so each carries its own parameter sets through
+    the concat. The pieces are joined with the concat demuxer and muxed with the stream-copied
+    audio of [start_time, end_time].
+    """
+    print(f"▶ video_cutter_lib: Smart cutting video: {input_path} [{start_time}-{end_time}] -> {output_path}")
+    start_seconds = time_to_seconds(start_time)
+    end_seconds = time_to_seconds(end_time)
+    try:
+        keyframes = build_keyframe_index(input_path, process_callback)
+        stream_info = _probe_video_stream(input_path)
+        first_keyframe = next((k for k in keyframes if k >= start_seconds), None)
+        last_keyframe = next((k for k in reversed(keyframes) if k <= end_seconds), None)
+
+        work_dir = tempfile.mkdtemp(prefix="smartcut-", dir=os.path.dirname(os.path.abspath(output_path)))
+        try:
+            piece_ext = ".ts" if stream_info.get("codec_name") in SMART_CUT_ANNEXB_CODECS else ".mp4"
+            pieces = []
+            if first_keyframe is None or last_keyframe is None or last_keyframe <= first_keyframe:
+                # No full GOP inside the clip: re-encoding all of it is as cheap as it gets.
+                pieces.append(os.path.join(work_dir, "whole" + piece_ext))
+                _encode_video_piece(input_path, start_seconds, end_seconds, pieces[-1], stream_info, process_callback)
+            else:
+                if first_keyframe > start_seconds:
+                    pieces.append(os.path.join(work_dir, "head" + piece_ext))
+                    # Stops just before the first keyframe, which starts the middle piece.
+                    _encode_video_piece(input_path, start_seconds, first_keyframe - SMART_CUT_SEEK_MARGIN, pieces[-1], stream_info, process_callback)
+                pieces.append(os.path.join(work_dir, "middle" + piece_ext))
+                # Seeks just past the first keyframe (a stream-copy seek starts at the keyframe at
+                # or before it) and stops just before the last keyframe, which starts the tail.
+                middle_seek = first_keyframe + SMART_CUT_SEEK_MARGIN
+                _run_ffmpeg([
+                    "ffmpeg", "-y",
+                    "-ss", _precise_seconds(middle_seek),
+                    "-i", input_path,
+                    "-t", _precise_seconds(last_keyframe - middle_seek - SMART_CUT_SEEK_MARGIN),
+                    "-map", "0:v:0", "-an",
+                    "-c", "copy",
+                    pieces[-1]
+                ], process_callback)
+                if end_seconds > last_keyframe:
+                    pieces.append(os.path.join(work_dir, "tail" + piece_ext))
+                    # An accurate (decoding) seek keeps frames from its seek point on, so starting a hair early keeps the keyframe.
+                    _encode_video_piece(input_path, last_keyframe - SMART_CUT_SEEK_MARGIN, end_seconds, pieces[-1], stream_info, process_callback)
+            print(f"▶ video_cutter_lib: Smart cut pieces: {', '.join(os.path.basename(p) for p in pieces)}")
+
+            video_path = os.path.join(work_dir, "video.mp4")
+            concat_videos(pieces, video_path, process_callback)
+            _run_ffmpeg([
+                "ffmpeg", "-y",
+                "-i", video_path,
+                "-ss", start_time, "-to", end_time, "-i", input_path,
+                "-map", "0:v:0", "-map", "1:a?",
+                "-c", "copy",
+                "-shortest",
+                output_path
+            ], process_callback)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        print("▶ video_cutter_lib: Smart cut complete.")
+    except subprocess.CalledProcessError as e:
+        print(f"❌ video_cutter_lib: Smart cut error: {e}")
+        print(f"STDERR:\n{e.stderr}")
+        raise
+    except Exception as e:
+        print(f"❌ video_cutter_lib: An unexpected error occurred during smart cut: {e}")
+        raise
+
+PARALLEL_CHUNK_SIZE = 8 * 1024 * 1024 # Upper bound; small files are split so every connection gets a chunk
+PARALLEL_READ_SIZE = 256 * 1024
+PARALLEL_CHECKPOINT_BYTES = 1024 * 1024 # How often a chunk in progress records how far it got
+MAX_REDIRECTS = 5
+
+class _DownloadHandle:
+    """Popen-like handle (poll/kill) for an in-process download, so it can be passed to process_callback."""
+    pid = None
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self):
+        self._stop.set()
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+class _PooledHTTPConnection:
+    """One keep-alive connection reused for every range request of a download worker."""
+
+    def __init__(self, headers, timeout=30):
+        self._headers = dict(headers or {})
+        self._timeout = timeout
+        self._connection = None
+        self._origin = None
+
+    def request(self, url, byte_range=None):
+        """GETs url (following redirects) and returns the open response."""
+        for _ in range(MAX_REDIRECTS + 1):
+            parsed = urllib.parse.urlsplit(url)
+            origin = (parsed.scheme, parsed.netloc)
+            connection_class = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+            if self._connection is None or self._origin != origin:
+                self.close()
+                self._connection = connection_class(parsed.netloc, timeout=self._timeout)
+                self._origin = origin
+            headers = dict(self._headers)
+            if byte_range is not None:
+                headers["Range"] = f"bytes={byte_range[0]}-{byte_range[1]}"
+            path = urllib.parse.urlunsplit(("", "", parsed.path or "/", parsed.query, ""))
+            try:
+                self._connection.request("GET", path, headers=headers)
+                response = self._connection.getresponse()
+            except (http.client.HTTPException, OSError):
+                self.close() # Stale keep-alive connection; retried once on a fresh one
+                self._connection = connection_class(parsed.netloc, timeout=self._timeout)
+                self._connection.request("GET", path, headers=headers)
+                response = self._connection.getresponse()
+            if response.status in (301, 302, 303, 307, 308) and response.getheader("Location"):
+                response.read()
+                url = urllib.parse.urljoin(url, response.getheader("Location"))
+                continue
+            return response
+        raise OSError(f"Too many redirects for {url}")
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+def _probe_ranged_size(media_url, headers):
+    """Returns the total size if the server honours range requests, else None."""
+    connection = _PooledHTTPConnection(headers)
+    try:
+        response = connection.request(media_url, (0, 0))
+        response.read()
+        content_range = response.getheader("Content-Range") or ""
+        if response.status == 206 and "/" in content_range:
+            total = content_range.rsplit("/", 1)[1]
+            return int(total) if total.isdigit() else None
+        return None
+    finally:
+        connection.close()
+
+def parallel_download_file(media_url, output_path, connections=4, headers=None, progress_callback=None, handle=None):
+    """Downloads media_url over several concurrent range requests into output_path.
+
+    The file is preallocated as output_path + ".part" and every chunk is written at its offset
+    with os.pwrite. Each worker keeps one pooled keep-alive connection for all its chunks. The
+    part file is renamed into place only after every chunk arrived complete and the size matches.
+    Chunks are min(PARALLEL_CHUNK_SIZE, total size / connections) bytes, so small files still use
+    every connection. Progress is checkpointed in output_path + ".part.chunks.json" (after syncing
+    the data, with the chunk size): finished chunks, and for chunks in progress the offset written
+    up to, every PARALLEL_CHECKPOINT_BYTES. A download interrupted by an error or a crash resumes
+    from there, losing at most that much per connection.
+    Returns the number of bytes downloaded. Network and HTTP protocol errors are raised as OSError.
+    """
+    handle = handle or _DownloadHandle()
+    try:
+        total_size = _probe_ranged_size(media_url, headers)
+    except http.client.HTTPException as e:
+        raise OSError(f"Range probe of {media_url} failed: {e!r}") from e
+    if not total_size:
+        raise OSError(f"Server does not support range requests for {media_url}")
+    part_path = output_path + ".part"
+    checkpoint_path = part_path + ".chunks.json"
+    chunk_size = min(PARALLEL_CHUNK_SIZE, math.ceil(total_size / max(1, connections)))
+    chunk_size, done_chunks, partial_chunks = _load_chunk_checkpoint(part_path, checkpoint_path, total_size, chunk_size)
+    all_chunks = [(offset, min(offset + chunk_size, total_size) - 1) for offset in range(0, total_size, chunk_size)]
+    chunks = deque(chunk for chunk in all_chunks if chunk[0] not in done_chunks)
+    chunk_count = len(all_chunks)
+    resumed = bool(done_chunks or partial_chunks)
+    lock = threading.Lock()
+    state = {'downloaded': sum(last + 1 - first for first, last in all_chunks if first in done_chunks)
+                           + sum(offset - first for first, offset in partial_chunks.items()),
+             'completed_chunks': len(done_chunks), 'error': None}
+    started = time.monotonic()
+    if resumed:
+        print(f"▶ video_cutter_lib: Resuming {part_path}: {len(done_chunks)} of {chunk_count} chunks already downloaded, "
+              f"{len(partial_chunks)} partly, {state['downloaded']} of {total_size} bytes in total")
+
+    fd = os.open(part_path, os.O_RDWR | os.O_CREAT | (0 if resumed else os.O_TRUNC), 0o644)
+    try:
+        if resumed:
+            pass # The file already has its full size
+        elif hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(fd, 0, total_size)
+        else:
+            os.ftruncate(fd, total_size)
+
+        def worker():
+            connection = _PooledHTTPConnection(headers)
+            try:
+                while not handle.stopped:
+                    with lock:
+                        if not chunks or state['error']:
+                            return
+                        first, last = chunks.popleft()
+                        offset = partial_chunks.get(first, first)
+                    response = connection.request(media_url, (offset, last))
+                    if response.status != 206:
+                        raise OSError(f"Expected 206 for bytes {offset}-{last}, got {response.status}")
+                    synced_offset = offset
+                    while offset <= last:
+                        if handle.stopped:
+                            return
+                        data = response.read(min(PARALLEL_READ_SIZE, last + 1 - offset))
+                        if not data:
+                            raise OSError(f"Connection closed at byte {offset} of chunk {first}-{last}")
+                        os.pwrite(fd, data, offset)
+                        offset += len(data)
+                        with lock:
+                            state['downloaded'] += len(data)
+                            downloaded = state['downloaded']
+                        if progress_callback:
+                            elapsed = max(time.monotonic() - started, 0.001)
+                            speed = downloaded / elapsed
+                            progress_callback(ProgressEvent("download", downloaded * 100.0 / total_size, downloaded, total_size,
+                                                            speed, (total_size - downloaded) / speed if speed else None,
+                                                            state['completed_chunks'], chunk_count))
+                        if offset - synced_offset >= PARALLEL_CHECKPOINT_BYTES and offset <= last:
+                            os.fdatasync(fd) # The checkpoint must never claim bytes that aren't on disk yet
+                            with lock:
+                                partial_chunks[first] = offset
+                                _save_chunk_checkpoint(checkpoint_path, total_size, chunk_size, done_chunks, partial_chunks)
+                            synced_offset = offset
+                    os.fdatasync(fd)
+                    with lock:
+                        state['completed_chunks'] += 1
+                        done_chunks.add(first)
+                        partial_chunks.pop(first, None)
+                        _save_chunk_checkpoint(checkpoint_path, total_size, chunk_size, done_chunks, partial_chunks)
+            except Exception as e:
+                with lock:
+                    state['error'] = state['error'] or e
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, min(connections, chunk_count)))]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+    if handle.stopped:
+        _remove_files(part_path, checkpoint_path)
+        raise OSError("Download cancelled")
+    if state['error'] is not None: # The part file and its checkpoint are kept so a retry resumes
+        if isinstance(state['error'], http.client.HTTPException):
+            raise OSError(f"HTTP error while downloading {media_url}: {state['error']!r}") from state['error']
+        raise state['error']
+    if state['completed_chunks'] != chunk_count or state['downloaded'] != total_size or os.path.getsize(part_path) != total_size:
+        _remove_files(part_path, checkpoint_path)
+        raise OSError(f"Incomplete download of {media_url}: got {state['downloaded']} of {total_size} bytes")
+    os.replace(part_path, output_path)
+    _remove_files(checkpoint_path)
+    return total_size
+
+def _load_chunk_checkpoint(part_path, checkpoint_path, total_size, chunk_size):
+    """Returns (chunk_size, offsets of the chunks already in part_path, {chunk offset: offset written up to} of partial chunks).
+
+    A resumable checkpoint keeps the chunk size it was written with (even if the connection count
+    changed since); otherwise the given chunk_size and nothing downloaded are returned.
+    """
+    try:
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        saved_chunk_size = checkpoint.get("chunk_size")
+        if (checkpoint.get("total_size") == total_size and isinstance(saved_chunk_size, int)
+                and 0 < saved_chunk_size <= PARALLEL_CHUNK_SIZE and os.path.getsize(part_path) == total_size):
+            partial_chunks = {first: offset for first, offset in checkpoint.get("partial", [])
+                              if first % saved_chunk_size == 0 and first < offset < min(first + saved_chunk_size, total_size)}
+            return saved_chunk_size, set(checkpoint.get("done", [])), partial_chunks
+    except (OSError, ValueError, TypeError):
+        pass
+    return chunk_size, set(), {}
+
+def _save_chunk_checkpoint(checkpoint_path, total_size, chunk_size, done_chunks, partial_chunks):
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"total_size": total_size, "chunk_size": chunk_size, "done": sorted(done_chunks),
+                   "partial": sorted(partial_chunks.items())}, f)
+    os.replace(tmp_path, checkpoint_path)
+
+def _remove_files(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+@traced("download_full_video_parallel", output_arg="full_output_path", download=True)
+def download_full_video_parallel(url, full_output_path, connections=4, progress_callback=None, process_callback=None, resume=False):
+    """Downloads the full video over several concurrent connections per media file.
+
+    Direct HTTP(S) formats are fetched with parallel_download_file (merged with ffmpeg when video
+    and audio are separate). Fragmented (DASH/HLS) formats are left to yt-dlp with
+    --concurrent-fragments. With resume=True, streams finished by an interrupted earlier run are
+    reused. Returns the output path like download_full_video. Network, HTTP and unreadable
+    yt-dlp info errors are raised as OSError, so callers can fall back to download_full_video.
+    """
+    print(f"▶ video_cutter_lib: Downloading full video over {connections} connections: {url} -> {full_output_path}")
+    try:
+        info = _fetch_info_json(url, process_callback)
+    except ValueError as e:
+        raise OSError(f"Unreadable yt-dlp info for {url}: {e}") from e
+    formats = info.get("requested_formats") or [info]
+    if not all(f.get("url") and f.get("protocol") in ("http", "https") for f in formats):
+        print("▶ video_cutter_lib: Fragmented or non-HTTP format, downloading fragments concurrently with yt-dlp")
+        return download_full_video(url, full_output_path, progress_callback, process_callback, concurrent_fragments=connections, resume=resume)
+
+    handle = _DownloadHandle()
+    if process_callback:
+        process_callback(handle)
+    totals = {}
+    def report(index, event):
+        totals[index] = event
+        if progress_callback:
+            downloaded = sum(e.downloaded_bytes or 0 for e in totals.values())
+            total = sum(e.total_bytes or 0 for e in totals.values())
+            speed = sum(e.speed or 0 for e in totals.values())
+            if len(totals) == len(formats) and total:
+                progress_callback(ProgressEvent("download", downloaded * 100.0 / total, downloaded, total, speed,
+                                                (total - downloaded) / speed if speed else None, None, None))
+
+    part_paths = []
+    try:
+        for index, media_format in enumerate(formats):
+            part_path = f"{full_output_path}.f{media_format.get('format_id', index)}.{media_format.get('ext', 'bin')}"
+            part_paths.append(part_path)
+            if resume and os.path.exists(part_path):
+                print(f"▶ video_cutter_lib: Reusing already downloaded {part_path}")
+                size = os.path.getsize(part_path)
+                report(index, ProgressEvent("download", 100.0, size, size, None, None, None, None))
+                continue
+            parallel_download_file(media_format["url"], part_path, connections, media_format.get("http_headers") or info.get("http_headers"),
+                                   lambda event, index=index: report(index, event), handle)
+        if len(part_paths) == 1:
+            os.replace(part_paths[0], full_output_path)
+        else:
+            merged_path = full_output_path + ".merging.mp4"
+            command = ["ffmpeg", "-y"]
+            for part_path in part_paths:
+                command += ["-i", part_path]
+            for index in range(len(part_paths)):
+                command += ["-map", f"{index}"]
+            _run_ffmpeg(command + ["-c", "copy", merged_path], process_callback)
+            os.replace(merged_path, full_output_path)
+        handle.returncode = 0
+    except BaseException:
+        handle.returncode = 1
+        if resume and not handle.stopped:
+            raise # Keep finished streams for the resumed download
+        _remove_files(*part_paths)
+        raise
+    _remove_files(*part_paths)
+    print(f"▶ video_cutter_lib: Parallel full video download complete: {full_output_path}")
+    return full_output_path
+
+@traced("download_full_video", output_arg="full_output_path", download=True)
+def download_full_video(url, full_output_path, progress_callback=None, process_callback=None, concurrent_fragments=1, resume=False):
+    """Downloads the full video from the specified URL to the given full_output_path, with progress.
+
+    With resume=True, yt-dlp continues from the .part file (or fragments) a previous, interrupted
+    download left next to full_output_path; otherwise full_output_path (usually an empty
+    reservation) is overwritten and the download starts over.
+    """
     print(f"▶ video_cutter_lib: Downloading full video: {url} -> {full_output_path}")
     
     command = [
@@ -103,32 +1149,30 @@ def download_full_video(url, full_output_path, progress_callback=None):
         "--no-playlist",
         "--progress",
         "--newline", # Force progress on new lines
-        "--progress-template", "%(progress._percent_str)s", # Simplest percentage template
+        "--progress-template", YT_DLP_PROGRESS_TEMPLATE, # Machine-readable progress, see _parse_yt_dlp_progress
         "--merge-output-format", "mp4", 
+        "--continue" if resume else "--force-overwrites", # Without resume the output path is an empty reservation made by the caller
         "-o", full_output_path, 
-        "--print", "filename", 
+        "--print", "after_move:YTC_FILEPATH %(filepath)s", # Final path, printed once the file is in place
+        "--concurrent-fragments", str(max(1, concurrent_fragments)),
         url
     ]
     try:
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=False)
-        return_code, stdout_lines = _process_yt_dlp_output(process, progress_callback, "full_download")
-
-        stderr_output = ""
-        if process.stderr:
-            stderr_output = process.stderr.read().decode('utf-8', errors='replace')
-            process.stderr.close()
-            if stderr_output.strip():
-                print(f"▶ video_cutter_lib (full_download): STDERR:\n{stderr_output}")
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=False, start_new_session=True)
+        if process_callback:
+            process_callback(process)
+        printed_paths = []
+        def handle_stdout_line(line):
+            if line.startswith("YTC_FILEPATH "):
+                printed_paths.append(line.split(" ", 1)[1].strip())
+        return_code, stdout_tail, stderr_output = _process_yt_dlp_output(process, progress_callback, "full_download", on_stdout_line=handle_stdout_line)
 
         if return_code != 0:
-            raise subprocess.CalledProcessError(return_code, command, output="\n".join(stdout_lines), stderr=stderr_output)
+            raise subprocess.CalledProcessError(return_code, command, output=stdout_tail, stderr=stderr_output)
 
         confirmed_output_path = None
-        # Try to find the filename from --print filename, which might be mixed with progress lines
-        # It's often one of the last non-empty lines that is also a valid file path.
-        for line in reversed(stdout_lines):
-            potential_path = line.strip()
-            if potential_path and os.path.exists(potential_path) and potential_path.endswith(".mp4"): # Basic check
+        for potential_path in reversed(printed_paths):
+            if potential_path and os.path.exists(potential_path):
                 confirmed_output_path = potential_path
                 break
         